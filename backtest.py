@@ -3,16 +3,215 @@
 基于历史数据回测策略表现
 """
 
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import asdict
+import numpy as np
 import pandas as pd
-from typing import Dict, List
+from typing import Dict, List, Optional
 import logging
 from datetime import datetime
 
-from strategy import Strategy, SignalType, Position
-from precision_manager import precision_manager
+from config import config
+from strategy import Strategy, Position
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pacsv
+except ImportError:  # pyarrow为可选依赖，缺失时退回pandas解析
+    pa = None
+    pacsv = None
+
+try:
+    from numba import njit
+except ImportError:  # numba为可选依赖，缺失时以纯Python执行
+    def njit(*args, **kwargs):
+        if len(args) == 1 and callable(args[0]):
+            return args[0]
+        return lambda func: func
 
 logger = logging.getLogger(__name__)
 
+# _run_core 中的持仓编码: 0=空仓, 1=持多, 2=持空
+_POSITION_NAMES = ("", Position.LONG.name, Position.SHORT.name)
+# _run_core 中的平仓原因编码
+_CLOSE_REASONS = ("止损", "止盈", "平空", "平多")
+
+
+@njit(cache=True, fastmath=True, boundscheck=False)
+def _run_core(
+    close, mbi, rope, start, size, stop_loss_pct, take_profit_pct,
+    slippage, commission, capital
+):
+    """
+    回测逐K线主循环
+    
+    信号规则与 Strategy.generate_signal、止损止盈与 check_stop_loss /
+    check_take_profit 一致，交易和权益曲线写入预分配数组
+    
+    Returns:
+        交易数组(方向, 开仓索引, 平仓索引, 开仓价, 平仓价, 盈亏, 手续费, 原因), 交易数,
+        权益数组(K线索引, 已实现资金, 浮动盈亏), 权益记录数, 最终资金
+    """
+    n = close.shape[0]
+    t_pos = np.zeros(n, np.int8)
+    t_entry_idx = np.zeros(n, np.int64)
+    t_exit_idx = np.zeros(n, np.int64)
+    t_entry_price = np.zeros(n, np.float64)
+    t_exit_price = np.zeros(n, np.float64)
+    t_pnl = np.zeros(n, np.float64)
+    t_commission = np.zeros(n, np.float64)
+    t_reason = np.zeros(n, np.int8)
+    eq_idx = np.zeros(n, np.int64)
+    eq_capital = np.zeros(n, np.float64)
+    eq_unrealized = np.zeros(n, np.float64)
+    n_trades = 0
+    n_equity = 0
+    
+    position = 0
+    entry_price = 0.0
+    entry_idx = 0
+    
+    for i in range(start, n):
+        price = close[i]
+        
+        # 检查止损止盈（触发后本根K线不再生成信号）
+        reason = -1
+        if position == 1:
+            if (entry_price - price) / entry_price >= stop_loss_pct:
+                reason = 0
+            elif (price - entry_price) / entry_price >= take_profit_pct:
+                reason = 1
+        elif position == 2:
+            if (price - entry_price) / entry_price >= stop_loss_pct:
+                reason = 0
+            elif (entry_price - price) / entry_price >= take_profit_pct:
+                reason = 1
+        
+        # 生成信号: 0=无, 1=开多, 2=开空, 3=平多, 4=平空
+        signal = 0
+        if reason < 0:
+            if mbi[i] > 0:
+                if price > rope[i]:
+                    if position != 1:
+                        signal = 1
+                elif price < rope[i] and position == 1:
+                    signal = 3
+            elif mbi[i] < 0:
+                if price < rope[i]:
+                    if position != 2:
+                        signal = 2
+                elif price > rope[i] and position == 2:
+                    signal = 4
+            
+            if (signal == 1 and position == 2) or signal == 4:
+                reason = 2
+            elif (signal == 2 and position == 1) or signal == 3:
+                reason = 3
+        
+        # 平仓
+        if reason >= 0:
+            if position == 1:
+                exit_price = price * (1 - slippage)
+                pnl = (exit_price - entry_price) * size
+            else:
+                exit_price = price * (1 + slippage)
+                pnl = (entry_price - exit_price) * size
+            commission_cost = (entry_price + exit_price) * size * commission
+            pnl -= commission_cost
+            capital += pnl
+            
+            t_pos[n_trades] = position
+            t_entry_idx[n_trades] = entry_idx
+            t_exit_idx[n_trades] = i
+            t_entry_price[n_trades] = entry_price
+            t_exit_price[n_trades] = exit_price
+            t_pnl[n_trades] = pnl
+            t_commission[n_trades] = commission_cost
+            t_reason[n_trades] = reason
+            n_trades += 1
+            position = 0
+            
+            if signal == 0:
+                continue
+        
+        # 开仓
+        if signal == 1:
+            entry_price = price * (1 + slippage)
+            entry_idx = i
+            position = 1
+        elif signal == 2:
+            entry_price = price * (1 - slippage)
+            entry_idx = i
+            position = 2
+        
+        # 记录权益曲线
+        unrealized_pnl = 0.0
+        if position == 1:
+            unrealized_pnl = (price - entry_price) * size
+        elif position == 2:
+            unrealized_pnl = (entry_price - price) * size
+        
+        eq_idx[n_equity] = i
+        eq_capital[n_equity] = capital
+        eq_unrealized[n_equity] = unrealized_pnl
+        n_equity += 1
+    
+    return (
+        t_pos, t_entry_idx, t_exit_idx, t_entry_price, t_exit_price,
+        t_pnl, t_commission, t_reason, n_trades,
+        eq_idx, eq_capital, eq_unrealized, n_equity, capital,
+    )
+
+
+def load_history(symbol: str, interval: str, data_dir: str = "data") -> Optional[pd.DataFrame]:
+    """
+    加载回测历史K线数据
+    
+    优先读取Parquet缓存；缓存不存在或比CSV旧时解析CSV并重新写入缓存
+    
+    Args:
+        symbol: 交易对符号
+        interval: K线周期
+        data_dir: 数据目录（prepare_backtest_data.py 的输出目录）
+    
+    Returns:
+        以timestamp为索引的K线DataFrame，没有数据文件时返回None
+    """
+    csv_file = os.path.join(data_dir, f"{symbol}_{interval}.csv")
+    parquet_file = os.path.join(data_dir, f"{symbol}_{interval}.parquet")
+    
+    has_csv = os.path.exists(csv_file)
+    
+    # 缓存有效: 存在且不早于CSV
+    if pa is not None and os.path.exists(parquet_file):
+        if not has_csv or os.path.getmtime(parquet_file) >= os.path.getmtime(csv_file):
+            logger.debug("读取Parquet缓存: %s", parquet_file)
+            return pd.read_parquet(parquet_file)
+    
+    if not has_csv:
+        logger.error(f"历史数据不存在: {csv_file}")
+        return None
+    
+    if pa is not None:
+        # C++解析器，timestamp直接按毫秒时间戳类型解析
+        table = pacsv.read_csv(
+            csv_file,
+            convert_options=pacsv.ConvertOptions(column_types={'timestamp': pa.timestamp('ms')})
+        )
+        df = table.to_pandas(split_blocks=True, self_destruct=True).set_index('timestamp')
+    else:
+        df = pd.read_csv(csv_file, parse_dates=['timestamp'], index_col='timestamp')
+    
+    # 旧版数据文件带有reset_index产生的多余列
+    df = df.drop(columns=['index'], errors='ignore')
+    
+    if pa is not None:
+        df.to_parquet(parquet_file, compression='zstd')
+        logger.info(f"已写入Parquet缓存: {parquet_file}")
+    
+    return df
+
 
 class Backtest:
     """回测引擎"""
@@ -22,7 +221,8 @@ class Backtest:
         strategy: Strategy,
         initial_capital: float = 10000.0,
         slippage: float = 0.001,
-        commission: float = 0.0004
+        commission: float = 0.0004,
+        indicator_cache_dir: Optional[str] = None
     ):
         """
         初始化回测引擎
@@ -32,11 +232,13 @@ class Backtest:
             initial_capital: 初始资金
             slippage: 滑点
             commission: 手续费率
+            indicator_cache_dir: 指标磁盘缓存目录，为None时不使用缓存
         """
         self.strategy = strategy
         self.initial_capital = initial_capital
         self.slippage = slippage
         self.commission = commission
+        self.indicator_cache_dir = indicator_cache_dir
         
         # 回测状态
         self.capital = initial_capital
@@ -58,6 +260,8 @@ class Backtest:
         """
         运行回测
         
+        指标序列一次性向量化计算，逐K线的持仓/盈亏循环交给 _run_core 执行
+        
         Args:
             contract_id: 合约ID
             symbol: 交易对符号
@@ -77,161 +281,62 @@ class Backtest:
         self.trades = []
         self.equity_curve = []
         
-        current_position = Position.EMPTY
-        entry_price = 0.0
-        entry_time = None
+        # 预计算指标序列（与 Strategy.generate_signal 逐根计算的结果一致）
+        _, mbi, rope = self.strategy.compute_series(df, cache_dir=self.indicator_cache_dir)
+        mbi = np.nan_to_num(mbi)
+        rope = np.nan_to_num(rope)
+        close = np.ascontiguousarray(df['close'].to_numpy(np.float64))
         
-        # 遍历每根K线
-        for i in range(self.strategy.ma_long, len(df)):
-            # 获取当前数据
-            current_data = df.iloc[:i+1]
-            current_price = current_data['close'].iloc[-1]
-            current_time = current_data.index[-1]
-            
-            # 检查止损止盈
-            if current_position != Position.EMPTY:
-                # 止损检查
-                if self.strategy.check_stop_loss(
-                    contract_id, entry_price, current_price, current_position, stop_loss_pct
-                ):
-                    self._close_position(
-                        symbol, current_position, entry_price, current_price,
-                        position_size, entry_time, current_time, "止损"
-                    )
-                    current_position = Position.EMPTY
-                    continue
-                
-                # 止盈检查
-                if self.strategy.check_take_profit(
-                    contract_id, entry_price, current_price, current_position, take_profit_pct
-                ):
-                    self._close_position(
-                        symbol, current_position, entry_price, current_price,
-                        position_size, entry_time, current_time, "止盈"
-                    )
-                    current_position = Position.EMPTY
-                    continue
-            
-            # 生成信号
-            signal = self.strategy.generate_signal(
-                contract_id, current_data, current_position, current_price
-            )
-            
-            # 执行信号
-            if signal == SignalType.LONG:
-                if current_position == Position.SHORT:
-                    # 先平空
-                    self._close_position(
-                        symbol, current_position, entry_price, current_price,
-                        position_size, entry_time, current_time, "平空"
-                    )
-                
-                # 开多
-                entry_price = self._apply_slippage(current_price, "BUY")
-                entry_time = current_time
-                current_position = Position.LONG
-                logger.debug(f"{current_time}: 开多 @ {entry_price}")
-            
-            elif signal == SignalType.SHORT:
-                if current_position == Position.LONG:
-                    # 先平多
-                    self._close_position(
-                        symbol, current_position, entry_price, current_price,
-                        position_size, entry_time, current_time, "平多"
-                    )
-                
-                # 开空
-                entry_price = self._apply_slippage(current_price, "SELL")
-                entry_time = current_time
-                current_position = Position.SHORT
-                logger.debug(f"{current_time}: 开空 @ {entry_price}")
-            
-            elif signal == SignalType.CLOSE_LONG and current_position == Position.LONG:
-                self._close_position(
-                    symbol, current_position, entry_price, current_price,
-                    position_size, entry_time, current_time, "平多"
-                )
-                current_position = Position.EMPTY
-            
-            elif signal == SignalType.CLOSE_SHORT and current_position == Position.SHORT:
-                self._close_position(
-                    symbol, current_position, entry_price, current_price,
-                    position_size, entry_time, current_time, "平空"
-                )
-                current_position = Position.EMPTY
-            
-            # 记录权益曲线
-            unrealized_pnl = 0.0
-            if current_position == Position.LONG:
-                unrealized_pnl = (current_price - entry_price) * position_size
-            elif current_position == Position.SHORT:
-                unrealized_pnl = (entry_price - current_price) * position_size
-            
+        (
+            t_pos, t_entry_idx, t_exit_idx, t_entry_price, t_exit_price,
+            t_pnl, t_commission, t_reason, n_trades,
+            eq_idx, eq_capital, eq_unrealized, n_equity, final_capital,
+        ) = _run_core(
+            close, mbi, rope, self.strategy.ma_long, position_size,
+            stop_loss_pct, take_profit_pct, self.slippage, self.commission,
+            self.initial_capital
+        )
+        
+        # 还原交易记录和权益曲线
+        index = df.index
+        for k in range(n_trades):
+            entry_time = index[t_entry_idx[k]]
+            exit_time = index[t_exit_idx[k]]
+            entry_price = t_entry_price[k]
+            pnl = t_pnl[k]
+            self.trades.append({
+                'symbol': symbol,
+                'position': _POSITION_NAMES[t_pos[k]],
+                'entry_price': entry_price,
+                'exit_price': t_exit_price[k],
+                'size': position_size,
+                'pnl': pnl,
+                'pnl_pct': (pnl / (entry_price * position_size)) * 100,
+                'commission': t_commission[k],
+                'entry_time': entry_time,
+                'exit_time': exit_time,
+                'duration': (exit_time - entry_time).total_seconds() / 3600,  # 小时
+                'reason': _CLOSE_REASONS[t_reason[k]]
+            })
+        
+        for k in range(n_equity):
+            capital = eq_capital[k]
+            unrealized_pnl = eq_unrealized[k]
             self.equity_curve.append({
-                'timestamp': current_time,
-                'capital': self.capital,
+                'timestamp': index[eq_idx[k]],
+                'capital': capital,
                 'unrealized_pnl': unrealized_pnl,
-                'total_equity': self.capital + unrealized_pnl
+                'total_equity': capital + unrealized_pnl
             })
         
+        self.capital = float(final_capital)
+        
         # 计算回测结果
         results = self._calculate_results(symbol)
         logger.info(f"回测完成: {symbol}")
         
         return results
     
-    def _apply_slippage(self, price: float, side: str) -> float:
-        """应用滑点"""
-        if side == "BUY":
-            return price * (1 + self.slippage)
-        else:
-            return price * (1 - self.slippage)
-    
-    def _close_position(
-        self,
-        symbol: str,
-        position: Position,
-        entry_price: float,
-        exit_price: float,
-        size: float,
-        entry_time: datetime,
-        exit_time: datetime,
-        reason: str
-    ):
-        """平仓并记录交易"""
-        # 应用滑点
-        if position == Position.LONG:
-            exit_price = self._apply_slippage(exit_price, "SELL")
-            pnl = (exit_price - entry_price) * size
-        else:
-            exit_price = self._apply_slippage(exit_price, "BUY")
-            pnl = (entry_price - exit_price) * size
-        
-        # 扣除手续费
-        commission_cost = (entry_price + exit_price) * size * self.commission
-        pnl -= commission_cost
-        
-        # 更新资金
-        self.capital += pnl
-        
-        # 记录交易
-        self.trades.append({
-            'symbol': symbol,
-            'position': position.value,
-            'entry_price': entry_price,
-            'exit_price': exit_price,
-            'size': size,
-            'pnl': pnl,
-            'pnl_pct': (pnl / (entry_price * size)) * 100,
-            'commission': commission_cost,
-            'entry_time': entry_time,
-            'exit_time': exit_time,
-            'duration': (exit_time - entry_time).total_seconds() / 3600,  # 小时
-            'reason': reason
-        })
-        
-        logger.debug(f"{exit_time}: {reason} @ {exit_price}, 盈亏={pnl:.2f}")
-    
     def _calculate_results(self, symbol: str) -> Dict:
         """计算回测结果"""
         if not self.trades:
@@ -286,7 +391,8 @@ class Backtest:
             'final_capital': self.capital
         }
     
-    def print_results(self, results: Dict):
+    @staticmethod
+    def print_results(results: Dict):
         """打印回测结果"""
         logger.info("=" * 80)
         logger.info("回测结果")
@@ -304,4 +410,93 @@ class Backtest:
         logger.info(f"最大回撤: {results['max_drawdown']:.2f}%")
         logger.info(f"夏普比率: {results['sharpe_ratio']:.2f}")
         logger.info(f"最终资金: {results['final_capital']:.2f} USDT")
-        logger.info("=" * 80)
\ No newline at end of file
+        logger.info("=" * 80)
+
+
+def _backtest_one(symbol: str, pair_config_dict: Dict, cfg_dict: Dict) -> Optional[Dict]:
+    """
+    回测单个交易对（在子进程中执行）
+    
+    Args:
+        symbol: 交易对符号
+        pair_config_dict: 交易对配置（TradingPairConfig转换的字典）
+        cfg_dict: 策略配置（StrategyConfig转换的字典）
+    
+    Returns:
+        回测结果，没有历史数据时返回None
+    """
+    df = load_history(symbol, cfg_dict['timeframe'])
+    if df is None:
+        return None
+    
+    strategy = Strategy(
+        ma_short=cfg_dict.get('ma_short_period', 25),
+        ma_long=cfg_dict.get('ma_long_period', 200),
+        rope_period=cfg_dict['rope_period']
+    )
+    backtest = Backtest(
+        strategy,
+        slippage=cfg_dict['slippage'],
+        indicator_cache_dir=cfg_dict.get('indicator_cache_dir') or None
+    )
+    
+    return backtest.run(
+        pair_config_dict['contract_id'],
+        symbol,
+        df,
+        pair_config_dict['order_size'],
+        stop_loss_pct=cfg_dict['stop_loss_pct'],
+        take_profit_pct=cfg_dict['take_profit_pct']
+    )
+
+
+def run_backtest(max_workers: Optional[int] = None) -> Dict[str, Dict]:
+    """
+    回测所有配置的交易对
+    
+    各交易对相互独立，分发到进程池并行执行
+    
+    Args:
+        max_workers: 最大进程数，默认为CPU核数
+    
+    Returns:
+        {symbol: 回测结果}
+    """
+    cfg_dict = asdict(config.strategy)
+    pairs = config.trading_pairs
+    
+    if not pairs:
+        logger.warning("没有配置交易对，跳过回测")
+        return {}
+    
+    if max_workers is None:
+        max_workers = min(len(pairs), os.cpu_count() or 1)
+    max_workers = max(1, max_workers)
+    
+    logger.info(f"开始回测 {len(pairs)} 个交易对 (进程数={max_workers}, 周期={cfg_dict['timeframe']})")
+    
+    all_results: Dict[str, Dict] = {}
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            executor.submit(_backtest_one, symbol, asdict(pair_config), cfg_dict): symbol
+            for symbol, pair_config in pairs.items()
+        }
+        
+        for future in as_completed(futures):
+            symbol = futures[future]
+            try:
+                results = future.result()
+            except Exception as e:
+                logger.error(f"回测失败: {symbol}, {str(e)}")
+                continue
+            
+            if results is None:
+                continue
+            
+            all_results[symbol] = results
+            if results['total_trades'] > 0:
+                Backtest.print_results(results)
+            else:
+                logger.info(f"{symbol}: 回测期间没有交易")
+    
+    return all_results
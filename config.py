@@ -69,6 +69,7 @@ class StrategyConfig:
     take_profit_pct: float = 0.012   # 5%止盈
     slippage: float = 0.001         # 0.1%滑点
     timeframe: str = "15m"          # K线周期
+    indicator_cache_dir: str = ""   # 回测指标磁盘缓存目录，留空不启用
 
 class Config:
     """主配置类"""
@@ -3,14 +3,20 @@
 负责获取和管理K线数据 - 支持实时更新
 """
 
+import numpy as np
 import pandas as pd
 from typing import Dict, List, Optional
 from datetime import datetime
 import logging
 import asyncio
+import json
+import threading
+import time
 from edgex_sdk import Client
 from edgex_sdk.quote.client import GetKLineParams, KlineType, PriceType
 
+from strategy_kernels import KLINE_TIME, KLINE_COLUMNS
+
 logger = logging.getLogger(__name__)
 
 
@@ -32,16 +38,23 @@ class DataManager:
         "1d": KlineType.DAY_1,
     }
     
-    def __init__(self, client: Client, auto_refresh: bool = True):
+    def __init__(self, client: Client, auto_refresh: bool = True, price_max_age: float = 0.0):
         """
         初始化数据管理器
         
         Args:
             client: EdgeX客户端
             auto_refresh: 是否自动刷新数据
+            price_max_age: 缓存价格的最长有效时间（秒），默认0即每次查询REST；
+                接入推送价格源（调用update_price）后再按需开启
         """
         self.client = client
         self.auto_refresh = auto_refresh
+        self.price_max_age = price_max_age
+        
+        # 最新成交价及更新时间（time.monotonic）
+        self._last_trade_price: Dict[str, float] = {}
+        self._last_trade_time: Dict[str, float] = {}
         
         # K线数据缓存
         self.kline_cache: Dict[str, pd.DataFrame] = {}
@@ -107,8 +120,7 @@ class DataManager:
             df = self._parse_klines(klines)
             
             # 缓存数据
-            self.kline_cache[cache_key] = df
-            self.last_update[cache_key] = datetime.now()
+            self._update_cache(cache_key, df)
             
             logger.info(f"✓ K线初始化完成: {cache_key}, 共{len(df)}根, 时间范围: {df.index[0]} 至 {df.index[-1]}")
             
@@ -199,17 +211,20 @@ class DataManager:
                 combined.sort_index(inplace=True)
                 
                 # 更新缓存
-                self.kline_cache[cache_key] = combined
-                self.last_update[cache_key] = datetime.now()
+                self._update_cache(cache_key, combined)
                 
-                logger.debug(f"K线已刷新: {cache_key}, 当前共{len(combined)}根")
+                logger.debug("K线已刷新: %s, 当前共%s根", cache_key, len(combined))
             else:
-                self.kline_cache[cache_key] = new_df
-                self.last_update[cache_key] = datetime.now()
+                self._update_cache(cache_key, new_df)
             
         except Exception as e:
             logger.error(f"刷新K线异常: {cache_key}, {str(e)}")
     
+    def _update_cache(self, cache_key: str, df: pd.DataFrame):
+        """更新K线缓存及其更新时间"""
+        self.kline_cache[cache_key] = df
+        self.last_update[cache_key] = datetime.now()
+    
     async def _start_auto_refresh(self, contract_id: str, interval: str):
         """启动自动刷新任务"""
         cache_key = f"{contract_id}_{interval}"
@@ -265,13 +280,38 @@ class DataManager:
         
         return df
     
+    def update_price(self, contract_id: str, price: float):
+        """
+        更新合约最新成交价
+        
+        由 get_current_price 在REST查询成功后调用，调用方已有推送价格时也可直接写入
+        """
+        self._last_trade_price[contract_id] = price
+        self._last_trade_time[contract_id] = time.monotonic()
+    
+    def latest_price(self, contract_id: str) -> Optional[float]:
+        """
+        获取缓存的最新成交价（不发起网络请求）
+        
+        Returns:
+            最新成交价，没有缓存、未启用缓存或超过price_max_age时返回None
+        """
+        received = self._last_trade_time.get(contract_id)
+        if received is None or self.price_max_age <= 0 or time.monotonic() - received > self.price_max_age:
+            return None
+        return self._last_trade_price[contract_id]
+    
     async def get_current_price(self, contract_id: str) -> Optional[float]:
-        """获取当前价格"""
+        """获取当前价格（优先使用缓存价格，过期时查询REST）"""
+        price = self.latest_price(contract_id)
+        if price is not None:
+            return price
+        
         try:
             quote = await self.client.get_24_hour_quote(contract_id)
             
             if quote.get("code") != "SUCCESS":
-                logger.error(f"获取行情失败: {contract_id}")
+                logger.error("获取行情失败: %s", contract_id)
                 return None
             
             data = quote.get("data", [])
@@ -279,11 +319,13 @@ class DataManager:
                 data = data[0]
             
             last_price = float(data.get("lastPrice", 0))
-            logger.debug(f"{contract_id} 当前价格: {last_price}")
+            logger.debug("%s 当前价格: %s", contract_id, last_price)
+            if last_price > 0:
+                self.update_price(contract_id, last_price)
             return last_price
             
         except Exception as e:
-            logger.error(f"获取价格异常: {contract_id}, {str(e)}")
+            logger.error("获取价格异常: %s, %s", contract_id, e)
             return None
     
     def get_cache_info(self) -> Dict:
@@ -324,4 +366,175 @@ class DataManager:
     async def close(self):
         """关闭数据管理器"""
         self.stop_auto_refresh()
-        logger.info("数据管理器已关闭")
\ No newline at end of file
+        logger.info("数据管理器已关闭")
+
+
+class WebsocketKlineFeed:
+    """
+    WebSocket K线推送 - 环形缓冲区版本
+    
+    每个合约一块预分配的float64环形缓冲区（列布局见 strategy_kernels.KLINE_*），
+    推送的K线按开盘时间原地更新当前K线或追加新K线；window() 返回按时间排序的
+    K线数组副本，可直接传给 RopeLineStrategy，无需构造DataFrame
+    
+    推送回调在WebSocket线程中写入，事件循环中读取，读写均在锁内进行
+    
+    用法:
+        feed = WebsocketKlineFeed(ws_manager, period=50)
+        feed.seed(contract_id, df)           # 用REST初始化的K线填充
+        feed.subscribe(contract_id, "15m")
+        window = feed.window(contract_id)
+    """
+    
+    def __init__(self, ws_manager, period: int = 50, margin: int = 64):
+        """
+        初始化K线推送
+        
+        Args:
+            ws_manager: EdgeX WebSocketManager
+            period: 策略所需K线数量（系绳线周期）
+            margin: 额外保留的K线数量
+        """
+        self.ws_manager = ws_manager
+        self.capacity = period + margin
+        
+        # 镜像环形缓冲区 shape=(2*capacity, KLINE_COLUMNS)：每根K线同时写入 slot 和
+        # slot+capacity，最近capacity根K线始终是一段连续切片
+        self._ohlcv: Dict[str, np.ndarray] = {}
+        # 下一个写入位置及已有K线数量
+        self._next: Dict[str, int] = {}
+        self._count: Dict[str, int] = {}
+        # WebSocket线程写入与事件循环读取之间的互斥锁
+        self._lock = threading.Lock()
+    
+    def _buffer(self, contract_id: str) -> np.ndarray:
+        """获取（必要时创建）合约的环形缓冲区"""
+        buf = self._ohlcv.get(contract_id)
+        if buf is None:
+            buf = np.zeros((2 * self.capacity, KLINE_COLUMNS), dtype=np.float64)
+            self._ohlcv[contract_id] = buf
+            self._next[contract_id] = 0
+            self._count[contract_id] = 0
+        return buf
+    
+    def seed(self, contract_id: str, df: pd.DataFrame):
+        """
+        用已有K线DataFrame填充缓冲区（覆盖原有数据）
+        
+        Args:
+            contract_id: 合约ID
+            df: K线数据DataFrame（时间索引，含open/high/low/close/volume列）
+        """
+        df = df.iloc[-self.capacity:]
+        n = len(df)
+        
+        rows = np.empty((n, KLINE_COLUMNS), dtype=np.float64)
+        # 转为毫秒时间戳（与索引的时间精度无关，兼容pandas 1.x的纳秒索引）
+        rows[:, KLINE_TIME] = df.index.values.astype('datetime64[ms]').view(np.int64)
+        rows[:, KLINE_TIME + 1:] = df[['open', 'high', 'low', 'close', 'volume']].to_numpy(np.float64)
+        
+        with self._lock:
+            buf = self._buffer(contract_id)
+            buf[:n] = rows
+            buf[self.capacity:self.capacity + n] = rows
+            self._next[contract_id] = n % self.capacity
+            self._count[contract_id] = n
+    
+    def update(
+        self,
+        contract_id: str,
+        kline_time: int,
+        open_: float,
+        high: float,
+        low: float,
+        close: float,
+        volume: float
+    ) -> bool:
+        """
+        写入一根K线：开盘时间与最新K线相同时原地更新，更新的时间则追加
+        
+        Args:
+            contract_id: 合约ID
+            kline_time: K线开盘时间（毫秒时间戳）
+        
+        Returns:
+            是否写入（早于最新K线的推送会被忽略）
+        """
+        cap = self.capacity
+        row = (kline_time, open_, high, low, close, volume)
+        
+        with self._lock:
+            buf = self._buffer(contract_id)
+            slot = self._next[contract_id]
+            count = self._count[contract_id]
+            
+            if count:
+                last = slot - 1 if slot else cap - 1
+                last_time = buf[last, KLINE_TIME]
+                if kline_time < last_time:
+                    return False
+                if kline_time == last_time:
+                    slot = last
+                    count -= 1
+            
+            buf[slot] = row
+            buf[slot + cap] = row
+            self._next[contract_id] = (slot + 1) % cap
+            self._count[contract_id] = min(count + 1, cap)
+        return True
+    
+    def window(self, contract_id: str, size: Optional[int] = None) -> Optional[np.ndarray]:
+        """
+        获取最近的K线（按时间升序，最后一根为当前未完成K线）
+        
+        在锁内复制出连续切片（至多capacity行），返回后不受WebSocket线程后续推送影响
+        
+        Args:
+            contract_id: 合约ID
+            size: K线数量，默认全部
+        
+        Returns:
+            shape=(n, KLINE_COLUMNS) 的数组，没有数据时返回None
+        """
+        with self._lock:
+            count = self._count.get(contract_id, 0)
+            if not count:
+                return None
+            n = count if size is None else min(size, count)
+            end = self._next[contract_id] + self.capacity
+            return self._ohlcv[contract_id][end - n:end].copy()
+    
+    def handle_kline(self, message: str):
+        """
+        WebSocket K线回调
+        
+        用法: ws_manager.subscribe_kline(contract_id, interval, feed.handle_kline)
+        """
+        try:
+            data = json.loads(message)
+            klines = data.get("content", {}).get("data", [])
+            if isinstance(klines, dict):
+                klines = [klines]
+            
+            for k in klines:
+                kline_time = k.get("klineTime") or k.get("startTime")
+                if not kline_time:
+                    continue
+                self.update(
+                    k.get("contractId"),
+                    int(kline_time),
+                    float(k.get("open", 0)),
+                    float(k.get("high", 0)),
+                    float(k.get("low", 0)),
+                    float(k.get("close", 0)),
+                    float(k.get("size", k.get("volume", 0)))
+                )
+        except Exception as e:
+            logger.error("解析K线推送异常: %s", e)
+    
+    def subscribe(self, contract_id: str, interval: str):
+        """订阅合约K线推送"""
+        with self._lock:
+            self._buffer(contract_id)
+        self.ws_manager.subscribe_kline(contract_id, interval, self.handle_kline)
+        logger.info(f"K线推送已订阅: {contract_id}_{interval}")
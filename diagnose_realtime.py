@@ -121,11 +121,11 @@ async def diagnose_realtime_system():
     strategy = RopeLineStrategy(rope_period=50)
     
     # 方式1: 排除最后一根（正确方式，用于实盘）
-    df_calc = df[['open', 'high', 'low', 'close', 'volume']].copy()
-    rope_exclude = strategy.calculate_rope_line(df_calc, exclude_current=True)
+    # calculate_rope_line 只读取high/low列，无需复制DataFrame
+    rope_exclude = strategy.calculate_rope_line(df, exclude_current=True)
     
     # 方式2: 包含最后一根（错误方式，但可能实盘误用了）
-    rope_include = strategy.calculate_rope_line(df_calc, exclude_current=False)
+    rope_include = strategy.calculate_rope_line(df, exclude_current=False)
     
     print(f"\n系绳线计算结果:")
     print(f"  排除最后一根K线 (正确): {rope_exclude:.2f}")
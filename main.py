@@ -12,11 +12,18 @@ from edgex_sdk import Client, WebSocketManager
 
 from config import config
 from rope_line_strategy import RopeLineStrategy, Position, SignalType
-from order_manager import OrderManager
+from data_manager import WebsocketKlineFeed
+from strategy_kernels import KLINE_TIME
+from order_manager import OrderManager, create_http_session
 from precision_manager import precision_manager
 from rate_limiter import rate_limiter
 from logger import setup_logger, log_signal, log_trade
 
+try:
+    import uvloop
+except ImportError:  # uvloop为可选依赖，缺失时使用默认事件循环
+    uvloop = None
+
 # 设置日志
 logger = logging.getLogger(__name__)
 
@@ -55,8 +62,14 @@ class RealtimeTradingBot:
         self.strategy = RopeLineStrategy(rope_period=50)
         self.logger.info("策略: 纯系绳线策略 (周期=50)")
         
-        # 创建订单管理器
-        self.order_manager = OrderManager(self.client)
+        # WebSocket K线推送（环形缓冲区），系绳线更新优先使用推送数据
+        self.kline_feed = WebsocketKlineFeed(self.ws_manager, period=self.strategy.rope_period)
+        
+        # 创建订单管理器（预分配所有合约的持仓槽位）
+        self.order_manager = OrderManager(self.client, session=create_http_session())
+        self.order_manager.register_contracts(
+            [pair_config.contract_id for pair_config in config.trading_pairs.values()]
+        )
         
         # 设置精度管理器
         for symbol, pair_config in config.trading_pairs.items():
@@ -94,14 +107,26 @@ class RealtimeTradingBot:
         self.logger.info("初始化数据")
         self.logger.info("=" * 80)
         
-        for symbol, pair_config in config.trading_pairs.items():
+        # 并发获取所有交易对的K线数据（由限速器控制请求频率）
+        pairs = list(config.trading_pairs.items())
+        results = await asyncio.gather(
+            *(
+                rate_limiter.execute(self.fetch_klines, pair_config.contract_id, size=51)
+                for _, pair_config in pairs
+            ),
+            return_exceptions=True
+        )
+        
+        for (symbol, pair_config), df in zip(pairs, results):
             self.logger.info(f"\n初始化 {symbol}...")
             
-            # 获取K线数据
-            df = await self.fetch_klines(pair_config.contract_id, size=51)
+            if isinstance(df, Exception):
+                self.logger.error(f"✗ {symbol}: 数据加载异常: {df}")
+                continue
             
             if df is not None and len(df) >= 51:
                 self.kline_data[pair_config.contract_id] = df
+                self.kline_feed.seed(pair_config.contract_id, df)
                 
                 # 计算初始系绳线
                 rope_line = self.strategy.calculate_rope_line(df, exclude_current=True)
@@ -178,8 +203,9 @@ class RealtimeTradingBot:
             
             ticker = ticker_list[0] if isinstance(ticker_list, list) else ticker_list
             
-            # 🔍 添加调试日志 - 查看实际数据结构
-            self.logger.debug(f"收到ticker数据: {json.dumps(ticker, indent=2)}")
+            # 🔍 添加调试日志 - 查看实际数据结构（仅DEBUG级别时格式化）
+            if self.logger.isEnabledFor(logging.DEBUG):
+                self.logger.debug("收到ticker数据: %s", json.dumps(ticker, indent=2))
             
             contract_id = ticker.get("contractId")  
             # 🔧 修改价格获取方式 - 尝试多个可能的字段
@@ -200,7 +226,7 @@ class RealtimeTradingBot:
                 self.logger.error(f"❌ 获取到无效价格: {new_price}, ticker数据: {ticker}")
                 return
             
-            self.logger.debug(f"✓ 获取到有效价格: {new_price}")
+            self.logger.debug("✓ 获取到有效价格: %s", new_price)
             
             # 找到对应的交易对配置
             pair_config = None
@@ -220,6 +246,10 @@ class RealtimeTradingBot:
             # 更新当前价格
             self.current_prices[contract_id] = new_price
             
+            # 止损止盈检查（持仓槽位只在事件循环线程中读写）
+            if self.loop and self.loop.is_running():
+                asyncio.run_coroutine_threadsafe(self.check_stops(contract_id, new_price), self.loop)
+            
             # 获取系绳线
             rope_line = self.rope_lines.get(contract_id)
             
@@ -288,7 +318,19 @@ class RealtimeTradingBot:
                 )
             
         except Exception as e:
-            self.logger.error(f"处理价格推送失败: {str(e)}")
+            self.logger.error("处理价格推送失败: %s", e)
+    
+    async def check_stops(self, contract_id: str, price: float):
+        """记录最新价格，并对所有持仓做一次向量化止损止盈检查"""
+        try:
+            self.order_manager.update_price(contract_id, price)
+            await self.order_manager.close_triggered_positions(
+                config.strategy.stop_loss_pct,
+                config.strategy.take_profit_pct,
+                config.strategy.slippage
+            )
+        except Exception as e:
+            self.logger.error("止损止盈检查失败: %s", e)
     
     async def check_and_execute(
         self,
@@ -367,9 +409,8 @@ class RealtimeTradingBot:
         try:
             self.logger.info(f"🎯 {symbol}: 执行信号 {signal.value} @ {price:.2f}")
             
-            # 调用订单管理器执行
-            await rate_limiter.execute(
-                self.order_manager.execute_signal,
+            # 提交到订单管理器的执行队列（限速在队列消费者中进行）
+            await self.order_manager.execute_signal(
                 contract_id,
                 symbol,
                 signal,
@@ -453,13 +494,16 @@ class RealtimeTradingBot:
                 for symbol, pair_config in config.trading_pairs.items():
                     contract_id = pair_config.contract_id
                     
-                    # 获取最新K线
-                    df = await self.fetch_klines(contract_id, size=51)
+                    # 优先使用K线推送（已收到新周期K线时），否则通过REST获取
+                    df = self.kline_feed.window(contract_id)
+                    if df is None or df[-1, KLINE_TIME] < next_update_time.timestamp() * 1000:
+                        df = await self.fetch_klines(contract_id, size=51)
+                        if df is not None:
+                            # 更新K线缓存
+                            self.kline_data[contract_id] = df
+                            self.kline_feed.seed(contract_id, df)
                     
                     if df is not None and len(df) >= 51:
-                        # 更新K线缓存
-                        self.kline_data[contract_id] = df
-                        
                         # 重新计算系绳线
                         old_rope = self.rope_lines.get(contract_id, 0)
                         new_rope = self.strategy.calculate_rope_line(df, exclude_current=True)
@@ -505,6 +549,9 @@ class RealtimeTradingBot:
             # 初始化数据
             await self.initialize_data()
             
+            # 启动信号执行队列
+            self.order_manager.start()
+            
             # 连接WebSocket
             self.logger.info("\n正在连接WebSocket...")
             self.ws_manager.connect_public()
@@ -520,6 +567,9 @@ class RealtimeTradingBot:
                 self.ws_manager.subscribe_ticker(contract_id, self.handle_ticker)
                 
                 self.logger.info(f"✓ {symbol}: 已订阅实时价格")
+                
+                # 订阅K线推送
+                self.kline_feed.subscribe(contract_id, "15m")
             
             # 设置运行标志
             self.is_running = True
@@ -549,10 +599,8 @@ class RealtimeTradingBot:
         except KeyboardInterrupt:
             self.logger.info("\n收到停止信号...")
             await self.shutdown()
-        except Exception as e:
-            self.logger.error(f"系统错误: {str(e)}")
-            import traceback
-            traceback.print_exc()
+        except Exception:
+            self.logger.exception("系统错误")
             await self.shutdown()
     
     async def shutdown(self):
@@ -564,6 +612,9 @@ class RealtimeTradingBot:
         # 停止运行标志
         self.is_running = False
         
+        # 停止信号执行队列
+        await self.order_manager.stop()
+        
         # 断开WebSocket
         try:
             self.ws_manager.disconnect_all()
@@ -579,7 +630,7 @@ class RealtimeTradingBot:
                 log_trade(self.logger, trade)
         
         # 打印最终盈亏
-        total_pnl = self.order_manager.calculate_total_pnl()
+        total_pnl = self.order_manager.calculate_total_pnl(exact=True)
         self.logger.info(f"\n最终盈亏: {total_pnl:.2f} USDT")
         
         # 打印统计信息
@@ -591,9 +642,7 @@ class RealtimeTradingBot:
         
         # 关闭REST客户端
         try:
-            if hasattr(self.client, 'async_client'):
-                if hasattr(self.client.async_client, 'session'):
-                    await self.client.async_client.session.close()
+            await self.order_manager.close()
         except:
             pass
         
@@ -628,4 +677,12 @@ async def main():
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    if "--backtest" in sys.argv:
+        from backtest import run_backtest
+        
+        setup_logger(log_dir=config.log_dir, log_level=config.log_level)
+        run_backtest()
+    elif uvloop is not None:
+        uvloop.run(main())
+    else:
+        asyncio.run(main())
\ No newline at end of file
@@ -11,7 +11,9 @@ EdgeX 市场数据监控系统
 
 import asyncio
 import os
+import sys
 import warnings
+from functools import lru_cache
 from datetime import datetime
 from dotenv import load_dotenv
 from edgex_sdk import Client
@@ -42,6 +44,13 @@ KLINE_INTERVAL_MAP = {
     "1M": KlineType.MONTH_1,
 }
 
+
+@lru_cache(maxsize=16)
+def _to_kline_type(interval: str) -> KlineType:
+    """interval 字符串转换为 KlineType 枚举（未知周期默认5分钟）"""
+    return KLINE_INTERVAL_MAP.get(interval, KlineType.MINUTE_5)
+
+
 # 常用合约映射
 CONTRACTS = {
     "10000001": {"name": "BTCUSDT", "symbol": "BTC", "tick": 0.1},
@@ -54,9 +63,13 @@ CONTRACTS = {
 class MarketDataMonitor:
     """市场数据监控器"""
     
-    def __init__(self, client: Client):
+    def __init__(self, client: Client, default_interval: str = "1m"):
         self.client = client
         self.contracts_info = {}
+        
+        # 默认K线周期的 KlineType 预先解析
+        self.default_interval = default_interval
+        self._kline_type = _to_kline_type(default_interval)
     
     async def initialize(self):
         """初始化：获取所有合约信息"""
@@ -158,7 +171,10 @@ class MarketDataMonitor:
         """获取K线数据"""
         try:
             # 转换 interval 字符串为 KlineType 枚举
-            kline_type = KLINE_INTERVAL_MAP.get(interval, KlineType.MINUTE_5)
+            if interval == self.default_interval:
+                kline_type = self._kline_type
+            else:
+                kline_type = _to_kline_type(interval)
             
             params = GetKLineParams(
                 contract_id=contract_id,
@@ -255,30 +271,24 @@ class MarketDataMonitor:
     async def show_orderbook(self, contract_id: str, limit: int = 15):
         """显示订单簿深度"""
         name = self.get_contract_name(contract_id)
-        print("=" * 70)
-        print(f"{name} 订单簿深度 (Top {limit})".center(70))
-        print("=" * 70)
-        
         orderbook = await self.get_orderbook(contract_id, limit)
         
+        # 所有行先缓存，最后一次性写出
+        lines = [
+            "=" * 70,
+            f"{name} 订单簿深度 (Top {limit})".center(70),
+            "=" * 70,
+        ]
+        
         if orderbook and isinstance(orderbook, dict):
             asks = orderbook.get("asks", [])  # 卖单（从低到高）
             bids = orderbook.get("bids", [])  # 买单（从高到低）
             
             # 显示卖单（倒序显示，价格从高到低）
-            print("\n📕 卖单 (ASK)".center(70))
-            print(f"{'价格':<20} {'数量':<20} {'累计':<20}")
-            print("-" * 70)
-            
-            cumulative = 0
-            for ask in reversed(asks[:limit]):
-                try:
-                    price = float(ask.get('price', 0))
-                    amount = float(ask.get('size', 0))
-                    cumulative += amount
-                    print(f"${price:<19,.2f} {amount:<19,.4f} {cumulative:<19,.4f}")
-                except Exception as e:
-                    print(f"解析错误: {e}, 数据: {ask}")
+            lines.append("\n📕 卖单 (ASK)".center(70))
+            lines.append(f"{'价格':<20} {'数量':<20} {'累计':<20}")
+            lines.append("-" * 70)
+            lines.extend(self._format_depth(reversed(asks[:limit])))
             
             # 显示当前价差
             if asks and bids:
@@ -287,31 +297,38 @@ class MarketDataMonitor:
                     best_bid = float(bids[0].get('price', 0))
                     spread = best_ask - best_bid
                     spread_percent = (spread / best_bid) * 100
-                    print("\n" + "-" * 70)
-                    print(f"价差: ${spread:.2f} ({spread_percent:.4f}%)".center(70))
-                    print("-" * 70)
+                    lines.append("\n" + "-" * 70)
+                    lines.append(f"价差: ${spread:.2f} ({spread_percent:.4f}%)".center(70))
+                    lines.append("-" * 70)
                 except Exception as e:
-                    print(f"计算价差错误: {e}")
+                    lines.append(f"计算价差错误: {e}")
             
             # 显示买单
-            print("\n📗 买单 (BID)".center(70))
-            print(f"{'价格':<20} {'数量':<20} {'累计':<20}")
-            print("-" * 70)
-            
-            cumulative = 0
-            for bid in bids[:limit]:
-                try:
-                    price = float(bid.get('price', 0))
-                    amount = float(bid.get('size', 0))
-                    cumulative += amount
-                    print(f"${price:<19,.2f} {amount:<19,.4f} {cumulative:<19,.4f}")
-                except Exception as e:
-                    print(f"解析错误: {e}, 数据: {bid}")
+            lines.append("\n📗 买单 (BID)".center(70))
+            lines.append(f"{'价格':<20} {'数量':<20} {'累计':<20}")
+            lines.append("-" * 70)
+            lines.extend(self._format_depth(bids[:limit]))
         else:
-            print("没有订单簿数据")
+            lines.append("没有订单簿数据")
         
-        print("=" * 70)
-        print()
+        lines.append("=" * 70)
+        lines.append("")
+        sys.stdout.write("\n".join(lines) + "\n")
+    
+    @staticmethod
+    def _format_depth(levels) -> list:
+        """格式化订单簿档位（价格、数量、累计数量）"""
+        rows = []
+        cumulative = 0
+        for level in levels:
+            try:
+                price = float(level.get('price', 0))
+                amount = float(level.get('size', 0))
+                cumulative += amount
+                rows.append(f"${price:<19,.2f} {amount:<19,.4f} {cumulative:<19,.4f}")
+            except Exception as e:
+                rows.append(f"解析错误: {e}, 数据: {level}")
+        return rows
 
 
 async def main():
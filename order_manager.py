@@ -3,18 +3,106 @@
 负责订单的创建、撤销和状态管理
 """
 
-from typing import Dict, List, Optional
+from typing import Callable, Dict, List, Optional, Set, Tuple
+from collections import defaultdict
 from dataclasses import dataclass
 from datetime import datetime
+import asyncio
+import aiohttp
 import logging
+import math
+import sys
+import time
+import numpy as np
 from edgex_sdk import Client
 from edgex_sdk.order.types import CreateOrderParams, CancelOrderParams, OrderType, OrderSide, TimeInForce
 
-from precision_manager import precision_manager
+from precision_manager import precision_manager, RoundDirection
+from rate_limiter import rate_limiter
 from strategy import Position, SignalType
+from strategy_kernels import sl_tp_hits
+
+try:
+    import orjson
+except ImportError:  # orjson为可选依赖，缺失时使用标准库json解析响应
+    orjson = None
 
 logger = logging.getLogger(__name__)
 
+# SDK响应成功码（驻留字符串，比较时可直接命中同一对象）
+_SUCCESS = sys.intern("SUCCESS")
+
+# 响应缺少data时的只读默认值，避免每次构造空字典
+_EMPTY: Dict = {}
+
+# 驻留的订单方向字符串
+_BUY = sys.intern("BUY")
+_SELL = sys.intern("SELL")
+
+# 预先解析的枚举常量，下单时免去枚举属性查找
+_GTC = TimeInForce.GOOD_TIL_CANCEL
+_IOC = TimeInForce.IMMEDIATE_OR_CANCEL
+_LIMIT = OrderType.LIMIT
+# 订单类型 -> 有效期（限价单GTC，其余IOC）
+_TIF_FOR = {OrderType.LIMIT: _GTC, OrderType.MARKET: _IOC}
+
+# 单次批量下单/撤单请求的最大订单数
+BATCH_LIMIT = 50
+
+# 撤单合并窗口（秒）
+CANCEL_COALESCE_WINDOW = 0.02
+
+# 待执行信号队列容量与消费者数量
+SIGNAL_QUEUE_SIZE = 256
+SIGNAL_WORKERS = 8
+# 停止时等待队列中信号执行完毕的最长时间（秒）
+SIGNAL_DRAIN_TIMEOUT = 10.0
+
+# 交易历史列存储的初始容量（满后按倍数扩容）
+TRADE_HISTORY_CAPACITY = 1024
+
+# 持仓止损止盈列存储的初始合约槽位数（满后按倍数扩容）
+CONTRACT_SLOT_CAPACITY = 16
+
+
+if orjson is not None:
+    class _OrjsonResponse(aiohttp.ClientResponse):
+        """默认使用orjson解析JSON响应的aiohttp响应类"""
+        
+        async def json(self, *, encoding=None, loads=orjson.loads, content_type="application/json"):
+            return await super().json(encoding=encoding, loads=loads, content_type=content_type)
+else:
+    _OrjsonResponse = aiohttp.ClientResponse
+
+
+def create_http_session(timeout: float = 30.0) -> aiohttp.ClientSession:
+    """
+    创建长连接复用的HTTP会话（需在事件循环中调用）
+    
+    Args:
+        timeout: 请求总超时（秒）
+    
+    Returns:
+        aiohttp会话
+    """
+    connector = aiohttp.TCPConnector(limit=100, keepalive_timeout=75, ttl_dns_cache=300)
+    return aiohttp.ClientSession(
+        connector=connector,
+        response_class=_OrjsonResponse,
+        timeout=aiohttp.ClientTimeout(total=timeout),
+        headers={
+            "Content-Type": "application/json",
+            "Accept": "application/json",
+        },
+    )
+
+
+def attach_http_session(client: Client, session: aiohttp.ClientSession):
+    """让SDK客户端使用指定的HTTP会话（SDK仅在会话为空或已关闭时自建会话）"""
+    async_client = getattr(client, "async_client", None)
+    if async_client is not None:
+        async_client._session = session
+
 
 @dataclass
 class PositionInfo:
@@ -24,24 +112,217 @@ class PositionInfo:
     position: Position  # 持仓方向
     entry_price: float  # 开仓价格
     size: float  # 持仓数量
-    entry_time: datetime  # 开仓时间
+    entry_time: float  # 开仓时间（Unix时间戳，秒）
     order_id: Optional[str] = None  # 订单ID
+
+
+@dataclass
+class ActiveOrder:
+    """活跃订单"""
+    
+    # 显式声明槽位（dataclass的slots参数需要Python 3.10+）
+    __slots__ = ('contract_id', 'symbol', 'side', 'size', 'price', 'type', 'time')
+    
+    contract_id: str
+    symbol: str
+    side: str
+    size: str  # 精度对齐后的数量
+    price: str  # 精度对齐后的价格
+    type: str  # 订单类型
+    time: float  # 下单时间（单调时钟）
     
 
 class OrderManager:
     """订单管理器"""
     
-    def __init__(self, client: Client):
+    def __init__(self, client: Client, session: Optional[aiohttp.ClientSession] = None):
         self.client = client
         
+        # 共享HTTP会话：整个生命周期复用连接池，避免重复TLS握手和DNS解析
+        self.session = session
+        if session is not None:
+            attach_http_session(client, session)
+        
         # 持仓记录
         self.positions: Dict[str, PositionInfo] = {}
         
         # 活跃订单记录
-        self.active_orders: Dict[str, Dict] = {}
+        self.active_orders: Dict[str, ActiveOrder] = {}
+        
+        # 合约 -> 活跃订单ID 索引，撤销整个合约的订单时无需遍历全部订单
+        self.orders_by_contract: Dict[str, Set[str]] = defaultdict(set)
+        
+        # 交易历史（列式存储：数值列为numpy数组，按需物化为字典列表）
+        self._n_trades = 0
+        self._total_pnl = 0.0  # 累计盈亏（平仓时增量更新）
+        self._pnl_arr = np.empty(TRADE_HISTORY_CAPACITY, dtype=np.float64)
+        self._size_arr = np.empty(TRADE_HISTORY_CAPACITY, dtype=np.float64)
+        self._entry_arr = np.empty(TRADE_HISTORY_CAPACITY, dtype=np.float64)
+        self._close_arr = np.empty(TRADE_HISTORY_CAPACITY, dtype=np.float64)
+        self._entry_time_arr = np.empty(TRADE_HISTORY_CAPACITY, dtype=np.float64)
+        self._close_time_arr = np.empty(TRADE_HISTORY_CAPACITY, dtype=np.float64)
+        self._trade_symbols: List[Optional[str]] = [None] * TRADE_HISTORY_CAPACITY
+        self._trade_actions: List[Optional[str]] = [None] * TRADE_HISTORY_CAPACITY
+        
+        # 持仓列式存储（按合约槽位索引），所有合约的止损止盈一次向量化检查
+        self._contract_slots: Dict[str, int] = {}
+        self._slot_contracts: List[str] = []
+        self._slot_entry = np.full(CONTRACT_SLOT_CAPACITY, np.nan)
+        self._slot_price = np.full(CONTRACT_SLOT_CAPACITY, np.nan)
+        self._slot_sign = np.zeros(CONTRACT_SLOT_CAPACITY, dtype=np.float64)  # 持多1, 持空-1, 空仓0
+        # 已提交止损/止盈平仓、尚未执行的合约（避免每个价格推送重复入队）
+        self._stop_pending: Set[str] = set()
+        
+        # 合约精度对齐函数缓存: contract_id -> (价格向下对齐, 价格向上对齐, 数量对齐)
+        self._precision_cache: Dict[str, Tuple[Callable, Callable, Callable]] = {}
+        
+        # 滑点系数缓存: slippage -> (买入系数, 卖出系数)
+        self._slippage_factors: Dict[float, Tuple[float, float]] = {}
+        
+        # SDK提供的批量接口（不支持时为None，回退为并发单笔请求）
+        self._create_order_batch = getattr(client, "create_order_batch", None)
+        self._cancel_order_batch = getattr(client, "cancel_order_batch", None)
+        
+        # 待合并撤单: 按提交顺序的订单ID及其结果future
+        self._pending_cancels: List[str] = []
+        self._cancel_futures: Dict[str, asyncio.Future] = {}
+        self._cancel_flush_task: Optional[asyncio.Task] = None
+        
+        # 信号执行队列：start() 后由消费者协程并发执行，同一合约串行
+        self._signal_q: asyncio.Queue = asyncio.Queue(maxsize=SIGNAL_QUEUE_SIZE)
+        self._signal_workers: List[asyncio.Task] = []
+        self._accepting_signals = True
+        self._contract_locks: Dict[str, asyncio.Lock] = defaultdict(asyncio.Lock)
+    
+    def start(self, num_workers: int = SIGNAL_WORKERS):
+        """启动信号消费者协程（需在事件循环中调用）"""
+        if self._signal_workers:
+            return
+        self._accepting_signals = True
+        self._signal_workers = [
+            asyncio.create_task(self._signal_worker()) for _ in range(num_workers)
+        ]
+        logger.info("信号执行队列已启动: %d 个消费者", num_workers)
+    
+    async def stop(self, timeout: float = SIGNAL_DRAIN_TIMEOUT):
+        """
+        停止信号消费者协程
+        
+        先停止接收新信号，等待已入队和执行中的信号完成（避免取消提交到一半的订单，
+        导致交易所有单而本地未记录），超时后再取消消费者
+        
+        Args:
+            timeout: 等待队列清空的最长时间（秒）
+        """
+        self._accepting_signals = False
+        workers, self._signal_workers = self._signal_workers, []
+        if not workers:
+            return
+        
+        try:
+            await asyncio.wait_for(self._signal_q.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning("等待信号执行超时(%.0fs)，丢弃剩余 %d 个信号", timeout, self._signal_q.qsize())
+        
+        for task in workers:
+            task.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+    
+    async def _signal_worker(self):
+        """信号消费者：从队列取出信号并执行"""
+        while True:
+            item = await self._signal_q.get()
+            try:
+                await self._run_signal(item)
+            except Exception:
+                logger.exception("执行信号异常: %s", item.get('symbol'))
+            finally:
+                self._signal_q.task_done()
+    
+    async def _run_signal(self, item: Dict) -> bool:
+        """限速并执行信号，同一合约的信号按入队顺序串行执行"""
+        contract_id = item['contract_id']
+        try:
+            async with self._contract_locks[contract_id]:
+                await rate_limiter.acquire()
+                return await self._execute_signal_impl(**item)
+        finally:
+            # 该合约的信号已执行，平仓失败时下一次价格推送会重新检查止损止盈
+            self._stop_pending.discard(contract_id)
+    
+    def _get_precision(self, contract_id: str) -> Optional[Tuple[Callable, Callable, Callable]]:
+        """获取合约精度对齐函数（首次访问时从precision_manager读取并缓存）"""
+        precision = self._precision_cache.get(contract_id)
+        if precision is None:
+            info = precision_manager.contract_info.get(contract_id)
+            if info is None:
+                return None
+            precision = (info["round_down"], info["round_up"], info["round_size"])
+            self._precision_cache[contract_id] = precision
+        return precision
+    
+    def _apply_slippage(self, price: float, side: str, slippage: float) -> float:
+        """应用滑点（系数按滑点值缓存）"""
+        factors = self._slippage_factors.get(slippage)
+        if factors is None:
+            factors = (1 + slippage, 1 - slippage)
+            self._slippage_factors[slippage] = factors
+        return price * (factors[0] if side == _BUY else factors[1])
+    
+    def _build_order_params(
+        self,
+        contract_id: str,
+        side: str,
+        size: float,
+        price: float,
+        order_type: OrderType = _LIMIT,
+        reduce_only: bool = False
+    ) -> Tuple[CreateOrderParams, str, str]:
+        """精度对齐并构造订单参数，返回 (参数, 对齐后数量, 对齐后价格)"""
+        # 买单价格向上对齐，卖单向下对齐
+        precision = self._get_precision(contract_id)
+        if precision is not None:
+            round_down, round_up, round_size = precision
+            aligned_price = round_up(price) if side == _BUY else round_down(price)
+            aligned_size = round_size(size)
+        else:
+            # 精度未设置，交由precision_manager告警并返回原值
+            direction = RoundDirection.UP if side == _BUY else RoundDirection.DOWN
+            aligned_price = precision_manager.round_price(contract_id, price, direction)
+            aligned_size = precision_manager.round_size(contract_id, size)
         
-        # 交易历史
-        self.trade_history: List[Dict] = []
+        params = CreateOrderParams(
+            contract_id=contract_id,
+            size=aligned_size,
+            price=aligned_price,
+            side=side,
+            type=order_type,
+            time_in_force=_TIF_FOR.get(order_type, _IOC),
+            reduce_only=reduce_only
+        )
+        return params, aligned_size, aligned_price
+    
+    def _record_order(
+        self,
+        order_id: str,
+        contract_id: str,
+        symbol: str,
+        side: str,
+        aligned_size: str,
+        aligned_price: str,
+        order_type: OrderType
+    ):
+        """记录活跃订单"""
+        self.active_orders[order_id] = ActiveOrder(
+            contract_id, symbol, side, aligned_size, aligned_price, order_type.value, time.monotonic()
+        )
+        self.orders_by_contract[contract_id].add(order_id)
+    
+    def _remove_order(self, order_id: str):
+        """从活跃订单及合约索引中移除订单"""
+        order = self.active_orders.pop(order_id, None)
+        if order is not None:
+            self.orders_by_contract[order.contract_id].discard(order_id)
     
     async def place_order(
         self,
@@ -50,7 +331,7 @@ class OrderManager:
         side: str,
         size: float,
         price: float,
-        order_type: OrderType = OrderType.LIMIT,
+        order_type: OrderType = _LIMIT,
         reduce_only: bool = False
     ) -> Optional[str]:
         """
@@ -69,84 +350,189 @@ class OrderManager:
             订单ID
         """
         try:
-            # 精度对齐
-            aligned_price = precision_manager.round_price(
-                contract_id, 
-                price, 
-                direction="up" if side == "BUY" else "down"
+            params, aligned_size, aligned_price = self._build_order_params(
+                contract_id, side, size, price, order_type, reduce_only
             )
-            aligned_size = precision_manager.round_size(contract_id, size)
-            
-            logger.info(f"下单: {symbol} {side} {aligned_size} @ {aligned_price}")
             
-            # 构造订单参数
-            params = CreateOrderParams(
-                contract_id=contract_id,
-                size=aligned_size,
-                price=aligned_price,
-                side=side,
-                type=order_type,
-                time_in_force=TimeInForce.GOOD_TIL_CANCEL if order_type == OrderType.LIMIT else TimeInForce.IMMEDIATE_OR_CANCEL,
-                reduce_only=reduce_only
-            )
+            logger.info("下单: %s %s %s @ %s", symbol, side, aligned_size, aligned_price)
             
             # 发送订单
             result = await self.client.create_order(params)
             
-            if result.get("code") == "SUCCESS":
-                order_data = result.get("data", {})
+            if result.get("code") == _SUCCESS:
+                order_data = result.get("data") or _EMPTY
                 order_id = order_data.get("orderId") or order_data.get("id")
                 
                 # 记录活跃订单
-                self.active_orders[order_id] = {
-                    'contract_id': contract_id,
-                    'symbol': symbol,
-                    'side': side,
-                    'size': aligned_size,
-                    'price': aligned_price,
-                    'type': order_type.value,
-                    'time': datetime.now()
-                }
+                self._record_order(
+                    order_id, contract_id, symbol, side, aligned_size, aligned_price, order_type
+                )
                 
-                logger.info(f"订单创建成功: {order_id}")
+                logger.info("订单创建成功: %s", order_id)
                 return order_id
             else:
-                logger.error(f"订单创建失败: {result.get('errorParam')}")
+                logger.error("订单创建失败: %s", result.get('errorParam'))
                 return None
                 
         except Exception as e:
-            logger.error(f"下单异常: {str(e)}")
+            logger.error("下单异常: %s", e)
             return None
     
+    async def place_orders_batch(self, orders: List[Dict]) -> List[Optional[str]]:
+        """
+        批量下单
+        
+        SDK支持批量接口时每 BATCH_LIMIT 笔合并为一次签名请求，按列表顺序提交；
+        否则并发发送单笔请求
+        
+        Args:
+            orders: 订单列表，每项为 place_order 的关键字参数字典
+        
+        Returns:
+            与orders一一对应的订单ID列表（失败为None）
+        """
+        if self._create_order_batch is None:
+            return list(await asyncio.gather(*(self.place_order(**order) for order in orders)))
+        
+        order_ids: List[Optional[str]] = []
+        for i in range(0, len(orders), BATCH_LIMIT):
+            chunk = orders[i:i + BATCH_LIMIT]
+            built = []
+            for order in chunk:
+                order_type = order.get('order_type', _LIMIT)
+                params, aligned_size, aligned_price = self._build_order_params(
+                    order['contract_id'], order['side'], order['size'], order['price'],
+                    order_type, order.get('reduce_only', False)
+                )
+                built.append((params, aligned_size, aligned_price, order_type))
+            
+            logger.info("批量下单: %s 笔", len(chunk))
+            
+            try:
+                result = await self._create_order_batch([b[0] for b in built])
+            except Exception as e:
+                logger.error("批量下单异常: %s", e)
+                order_ids.extend([None] * len(chunk))
+                continue
+            
+            if result.get("code") != _SUCCESS:
+                logger.error("批量下单失败: %s", result.get('errorParam'))
+                order_ids.extend([None] * len(chunk))
+                continue
+            
+            data = result.get("data") or []
+            if isinstance(data, dict):
+                data = data.get("dataList", [])
+            
+            for j, (order, (_, aligned_size, aligned_price, order_type)) in enumerate(zip(chunk, built)):
+                order_data = data[j] if j < len(data) else {}
+                order_id = order_data.get("orderId") or order_data.get("id")
+                if order_id:
+                    self._record_order(
+                        order_id, order['contract_id'], order['symbol'], order['side'],
+                        aligned_size, aligned_price, order_type
+                    )
+                order_ids.append(order_id)
+        
+        return order_ids
+    
     async def cancel_order(self, order_id: str) -> bool:
         """
         撤销订单
         
+        SDK支持批量撤单时，CANCEL_COALESCE_WINDOW 内的撤单请求合并为一次批量撤单
+        
         Args:
             order_id: 订单ID
         
         Returns:
             是否成功
         """
+        if self._cancel_order_batch is None:
+            return await self._cancel_one(order_id)
+        
+        future = self._cancel_futures.get(order_id)
+        if future is None:
+            future = asyncio.get_running_loop().create_future()
+            self._cancel_futures[order_id] = future
+            self._pending_cancels.append(order_id)
+            if self._cancel_flush_task is None:
+                self._cancel_flush_task = asyncio.create_task(self._flush_cancels())
+        return await asyncio.shield(future)
+    
+    async def _flush_cancels(self):
+        """等待合并窗口结束后批量提交待撤订单"""
+        await asyncio.sleep(CANCEL_COALESCE_WINDOW)
+        
+        order_ids, self._pending_cancels = self._pending_cancels, []
+        futures = [self._cancel_futures.pop(oid) for oid in order_ids]
+        self._cancel_flush_task = None
+        
+        try:
+            results = await self.cancel_orders_batch(order_ids)
+        except Exception as e:
+            logger.error("批量撤单异常: %s", e)
+            results = [False] * len(order_ids)
+        
+        for future, ok in zip(futures, results):
+            if not future.done():
+                future.set_result(ok)
+    
+    async def _cancel_one(self, order_id: str) -> bool:
+        """发送单笔撤单请求"""
         try:
             params = CancelOrderParams(order_id=order_id)
             result = await self.client.cancel_order(params)
             
-            if result.get("code") == "SUCCESS":
+            if result.get("code") == _SUCCESS:
                 # 从活跃订单中移除
-                if order_id in self.active_orders:
-                    del self.active_orders[order_id]
+                self._remove_order(order_id)
                 
-                logger.info(f"订单已撤销: {order_id}")
+                logger.info("订单已撤销: %s", order_id)
                 return True
             else:
-                logger.error(f"撤单失败: {result.get('errorParam')}")
+                logger.error("撤单失败: %s", result.get('errorParam'))
                 return False
                 
         except Exception as e:
-            logger.error(f"撤单异常: {str(e)}")
+            logger.error("撤单异常: %s", e)
             return False
     
+    async def cancel_orders_batch(self, order_ids: List[str]) -> List[bool]:
+        """
+        批量撤单
+        
+        Args:
+            order_ids: 订单ID列表
+        
+        Returns:
+            与order_ids一一对应的撤单结果
+        """
+        if self._cancel_order_batch is None:
+            return list(await asyncio.gather(*(self._cancel_one(oid) for oid in order_ids)))
+        
+        results: List[bool] = []
+        for i in range(0, len(order_ids), BATCH_LIMIT):
+            chunk = order_ids[i:i + BATCH_LIMIT]
+            
+            try:
+                result = await self._cancel_order_batch(chunk)
+            except Exception as e:
+                logger.error("批量撤单异常: %s", e)
+                results.extend([False] * len(chunk))
+                continue
+            
+            if result.get("code") == _SUCCESS:
+                for oid in chunk:
+                    self._remove_order(oid)
+                logger.info("已批量撤销 %s 笔订单", len(chunk))
+                results.extend([True] * len(chunk))
+            else:
+                logger.error("批量撤单失败: %s", result.get('errorParam'))
+                results.extend([False] * len(chunk))
+        
+        return results
+    
     async def cancel_all_orders(self, contract_id: str) -> bool:
         """
         撤销所有订单
@@ -161,21 +547,20 @@ class OrderManager:
             params = CancelOrderParams(contract_id=contract_id)
             result = await self.client.cancel_order(params)
             
-            if result.get("code") == "SUCCESS":
+            if result.get("code") == _SUCCESS:
                 # 清除该合约的活跃订单
-                to_remove = [oid for oid, order in self.active_orders.items() 
-                            if order['contract_id'] == contract_id]
+                to_remove = self.orders_by_contract.pop(contract_id, set())
                 for oid in to_remove:
-                    del self.active_orders[oid]
+                    self.active_orders.pop(oid, None)
                 
-                logger.info(f"已撤销合约 {contract_id} 的所有订单")
+                logger.info("已撤销合约 %s 的所有订单", contract_id)
                 return True
             else:
-                logger.error(f"批量撤单失败: {result.get('errorParam')}")
+                logger.error("批量撤单失败: %s", result.get('errorParam'))
                 return False
                 
         except Exception as e:
-            logger.error(f"批量撤单异常: {str(e)}")
+            logger.error("批量撤单异常: %s", e)
             return False
     
     async def execute_signal(
@@ -188,7 +573,10 @@ class OrderManager:
         slippage: float
     ) -> bool:
         """
-        执行交易信号
+        提交交易信号
+        
+        已调用 start() 时信号放入执行队列后立即返回（队列满时等待）；
+        否则直接执行；stop() 之后的信号被忽略
         
         Args:
             contract_id: 合约ID
@@ -199,21 +587,50 @@ class OrderManager:
             slippage: 滑点
         
         Returns:
-            是否执行成功
+            已入队时返回True，直接执行时返回是否执行成功
         """
+        if not self._accepting_signals:
+            logger.warning("%s: 订单管理器正在停止，忽略信号 %s", symbol, signal.name)
+            return False
+        
+        item = {
+            'contract_id': contract_id,
+            'symbol': symbol,
+            'signal': signal,
+            'current_price': current_price,
+            'order_size': order_size,
+            'slippage': slippage
+        }
+        
+        if not self._signal_workers:
+            return await self._run_signal(item)
+        
+        await self._signal_q.put(item)
+        return True
+    
+    async def _execute_signal_impl(
+        self,
+        contract_id: str,
+        symbol: str,
+        signal: SignalType,
+        current_price: float,
+        order_size: float,
+        slippage: float
+    ) -> bool:
+        """执行交易信号，返回是否执行成功"""
         current_position = self.get_position(contract_id)
         
         if signal == SignalType.LONG:
             # 开多或平空开多
+            order_price = self._apply_slippage(current_price, _BUY, slippage)
             if current_position == Position.SHORT:
-                # 先平空
-                await self.close_position(contract_id, symbol, current_price, slippage)
-            
-            # 开多
-            order_price = precision_manager.apply_slippage(current_price, "BUY", slippage)
-            order_id = await self.place_order(
-                contract_id, symbol, "BUY", order_size, order_price
-            )
+                order_id = await self._reverse_position(
+                    contract_id, symbol, _BUY, current_price, order_price, order_size, slippage
+                )
+            else:
+                order_id = await self.place_order(
+                    contract_id, symbol, _BUY, order_size, order_price
+                )
             
             if order_id:
                 self.positions[contract_id] = PositionInfo(
@@ -222,23 +639,24 @@ class OrderManager:
                     position=Position.LONG,
                     entry_price=order_price,
                     size=order_size,
-                    entry_time=datetime.now(),
+                    entry_time=time.time(),
                     order_id=order_id
                 )
-                logger.info(f"{symbol}: 开多成功 @ {order_price}")
+                self._set_slot(contract_id, 1.0, order_price)
+                logger.info("%s: 开多成功 @ %s", symbol, order_price)
                 return True
         
         elif signal == SignalType.SHORT:
             # 开空或平多开空
+            order_price = self._apply_slippage(current_price, _SELL, slippage)
             if current_position == Position.LONG:
-                # 先平多
-                await self.close_position(contract_id, symbol, current_price, slippage)
-            
-            # 开空
-            order_price = precision_manager.apply_slippage(current_price, "SELL", slippage)
-            order_id = await self.place_order(
-                contract_id, symbol, "SELL", order_size, order_price
-            )
+                order_id = await self._reverse_position(
+                    contract_id, symbol, _SELL, current_price, order_price, order_size, slippage
+                )
+            else:
+                order_id = await self.place_order(
+                    contract_id, symbol, _SELL, order_size, order_price
+                )
             
             if order_id:
                 self.positions[contract_id] = PositionInfo(
@@ -247,10 +665,11 @@ class OrderManager:
                     position=Position.SHORT,
                     entry_price=order_price,
                     size=order_size,
-                    entry_time=datetime.now(),
+                    entry_time=time.time(),
                     order_id=order_id
                 )
-                logger.info(f"{symbol}: 开空成功 @ {order_price}")
+                self._set_slot(contract_id, -1.0, order_price)
+                logger.info("%s: 开空成功 @ %s", symbol, order_price)
                 return True
         
         elif signal == SignalType.CLOSE_LONG:
@@ -267,6 +686,57 @@ class OrderManager:
         
         return False
     
+    async def _reverse_position(
+        self,
+        contract_id: str,
+        symbol: str,
+        side: str,
+        current_price: float,
+        order_price: float,
+        order_size: float,
+        slippage: float
+    ) -> Optional[str]:
+        """
+        反手：平掉当前持仓并按side开新仓
+        
+        SDK支持批量接口时，只减仓平仓单和开仓单放在同一批次中按顺序提交；
+        否则先以只减仓单平仓，确认成功后再开仓（不合并为一笔反向大单，
+        以免双向持仓模式或部分成交时本地持仓与盈亏记录出错）
+        
+        Returns:
+            新开仓订单ID，平仓失败时为None（批量提交的开仓单会被撤销）
+        """
+        if self._create_order_batch is None:
+            if not await self.close_position(contract_id, symbol, current_price, slippage):
+                logger.warning("%s: 反手平仓失败，放弃开仓", symbol)
+                return None
+            return await self.place_order(contract_id, symbol, side, order_size, order_price)
+        
+        position_info = self.positions[contract_id]
+        
+        # 平空与开多同为BUY，平多与开空同为SELL
+        close_price = self._apply_slippage(current_price, side, slippage)
+        close_id, open_id = await self.place_orders_batch([
+            {
+                'contract_id': contract_id, 'symbol': symbol, 'side': side,
+                'size': position_info.size, 'price': close_price, 'reduce_only': True
+            },
+            {
+                'contract_id': contract_id, 'symbol': symbol, 'side': side,
+                'size': order_size, 'price': order_price
+            },
+        ])
+        
+        if not close_id:
+            # 旧仓仍在，撤销同批次的开仓单，避免新持仓覆盖未平的旧仓
+            logger.warning("%s: 反手平仓失败，撤销开仓单", symbol)
+            if open_id and not await self.cancel_order(open_id):
+                logger.error("%s: 反手开仓单撤销失败，请人工核对持仓: %s", symbol, open_id)
+            return None
+        
+        self._record_close(contract_id, symbol, close_price)
+        return open_id
+    
     async def close_position(
         self,
         contract_id: str,
@@ -287,23 +757,21 @@ class OrderManager:
             是否成功
         """
         if contract_id not in self.positions:
-            logger.warning(f"{symbol}: 没有持仓，无法平仓")
+            logger.warning("%s: 没有持仓，无法平仓", symbol)
             return False
         
         position_info = self.positions[contract_id]
         
         # 确定平仓方向
         if position_info.position == Position.LONG:
-            side = "SELL"
-            action = "平多"
+            side = _SELL
         elif position_info.position == Position.SHORT:
-            side = "BUY"
-            action = "平空"
+            side = _BUY
         else:
             return False
         
         # 计算平仓价格
-        close_price = precision_manager.apply_slippage(current_price, side, slippage)
+        close_price = self._apply_slippage(current_price, side, slippage)
         
         # 下平仓单
         order_id = await self.place_order(
@@ -316,35 +784,165 @@ class OrderManager:
         )
         
         if order_id:
-            # 计算盈亏
-            if position_info.position == Position.LONG:
-                pnl = (close_price - position_info.entry_price) * position_info.size
-            else:
-                pnl = (position_info.entry_price - close_price) * position_info.size
-            
-            pnl_pct = pnl / (position_info.entry_price * position_info.size) * 100
-            
-            # 记录交易历史
-            self.trade_history.append({
-                'symbol': symbol,
-                'action': action,
-                'entry_price': position_info.entry_price,
-                'close_price': close_price,
-                'size': position_info.size,
-                'pnl': pnl,
-                'pnl_pct': pnl_pct,
-                'entry_time': position_info.entry_time,
-                'close_time': datetime.now()
-            })
-            
-            logger.info(f"{symbol}: {action}成功 @ {close_price}, 盈亏: {pnl:.2f} USDT ({pnl_pct:.2f}%)")
-            
-            # 移除持仓
-            del self.positions[contract_id]
+            self._record_close(contract_id, symbol, close_price)
             return True
         
         return False
     
+    def _record_close(self, contract_id: str, symbol: str, close_price: float):
+        """记录平仓交易并移除持仓"""
+        position_info = self.positions[contract_id]
+        
+        # 计算盈亏
+        if position_info.position == Position.LONG:
+            action = "平多"
+            pnl = (close_price - position_info.entry_price) * position_info.size
+        else:
+            action = "平空"
+            pnl = (position_info.entry_price - close_price) * position_info.size
+        
+        # 记录交易历史（盈亏百分比在读取时计算）
+        self._append_trade(
+            symbol, action, position_info.entry_price, close_price, position_info.size,
+            pnl, position_info.entry_time, time.time()
+        )
+        
+        if logger.isEnabledFor(logging.INFO):
+            pnl_pct = pnl / (position_info.entry_price * position_info.size) * 100
+            logger.info("%s: %s成功 @ %s, 盈亏: %.2f USDT (%.2f%%)", symbol, action, close_price, pnl, pnl_pct)
+        
+        # 移除持仓
+        del self.positions[contract_id]
+        self._set_slot(contract_id, 0.0, np.nan)
+    
+    def _append_trade(
+        self,
+        symbol: str,
+        action: str,
+        entry_price: float,
+        close_price: float,
+        size: float,
+        pnl: float,
+        entry_time: float,
+        close_time: float
+    ):
+        """向列式交易历史追加一笔交易"""
+        n = self._n_trades
+        if n == len(self._pnl_arr):
+            # 容量不足时翻倍扩容
+            capacity = n * 2
+            for name in ('_pnl_arr', '_size_arr', '_entry_arr', '_close_arr',
+                         '_entry_time_arr', '_close_time_arr'):
+                arr = np.empty(capacity, dtype=np.float64)
+                arr[:n] = getattr(self, name)
+                setattr(self, name, arr)
+            self._trade_symbols.extend([None] * n)
+            self._trade_actions.extend([None] * n)
+        
+        self._pnl_arr[n] = pnl
+        self._size_arr[n] = size
+        self._entry_arr[n] = entry_price
+        self._close_arr[n] = close_price
+        self._entry_time_arr[n] = entry_time
+        self._close_time_arr[n] = close_time
+        self._trade_symbols[n] = symbol
+        self._trade_actions[n] = action
+        self._n_trades = n + 1
+        self._total_pnl += pnl
+    
+    async def close(self):
+        """关闭HTTP会话"""
+        session = self.session
+        if session is None:
+            session = getattr(getattr(self.client, "async_client", None), "_session", None)
+        if session is not None and not session.closed:
+            await session.close()
+            # 让底层SSL连接完成关闭
+            await asyncio.sleep(0)
+    
+    def _slot(self, contract_id: str) -> int:
+        """获取合约在持仓列存储中的槽位，不存在时分配（容量不足时翻倍扩容）"""
+        slot = self._contract_slots.get(contract_id)
+        if slot is None:
+            slot = len(self._slot_contracts)
+            if slot == len(self._slot_sign):
+                for name, fill in (('_slot_entry', np.nan), ('_slot_price', np.nan), ('_slot_sign', 0.0)):
+                    arr = np.full(slot * 2, fill)
+                    arr[:slot] = getattr(self, name)
+                    setattr(self, name, arr)
+            self._contract_slots[contract_id] = slot
+            self._slot_contracts.append(contract_id)
+        return slot
+    
+    def _set_slot(self, contract_id: str, sign: float, entry_price: float):
+        """更新合约槽位的持仓方向和开仓价"""
+        slot = self._slot(contract_id)
+        self._slot_sign[slot] = sign
+        self._slot_entry[slot] = entry_price
+    
+    def register_contracts(self, contract_ids: List[str]):
+        """启动时为所有交易合约预分配持仓槽位（之后不再扩容）"""
+        for contract_id in contract_ids:
+            self._slot(contract_id)
+    
+    def update_price(self, contract_id: str, price: float):
+        """
+        记录合约最新价格（供 check_all_stops 使用）
+        
+        只写入已分配的槽位、不分配新槽位；与开平仓一样须在事件循环线程中调用
+        """
+        slot = self._contract_slots.get(contract_id)
+        if slot is not None:
+            self._slot_price[slot] = price
+    
+    def check_all_stops(self, stop_loss_pct: float, take_profit_pct: float) -> Tuple[List[str], List[str]]:
+        """
+        一次向量化检查所有持仓的止损/止盈
+        
+        Args:
+            stop_loss_pct: 止损百分比
+            take_profit_pct: 止盈百分比
+        
+        Returns:
+            (触发止损的合约ID列表, 触发止盈的合约ID列表)
+        """
+        n = len(self._slot_contracts)
+        # 槽位方向即 strategy_kernels 的持仓编码（持多1, 持空-1, 空仓0）
+        sl_hit, tp_hit = sl_tp_hits(
+            self._slot_entry[:n], self._slot_price[:n], self._slot_sign[:n], stop_loss_pct, take_profit_pct
+        )
+        stop = np.flatnonzero(sl_hit)
+        take = np.flatnonzero(tp_hit)
+        contracts = self._slot_contracts
+        return [contracts[i] for i in stop], [contracts[i] for i in take]
+    
+    async def close_triggered_positions(self, stop_loss_pct: float, take_profit_pct: float, slippage: float):
+        """
+        检查所有持仓的止损/止盈，并为触发的合约提交平仓信号
+        
+        Args:
+            stop_loss_pct: 止损百分比
+            take_profit_pct: 止盈百分比
+            slippage: 滑点
+        """
+        stop_ids, take_ids = self.check_all_stops(stop_loss_pct, take_profit_pct)
+        for contract_ids, reason in ((stop_ids, "止损"), (take_ids, "止盈")):
+            for contract_id in contract_ids:
+                position_info = self.positions.get(contract_id)
+                if position_info is None or contract_id in self._stop_pending:
+                    continue
+                self._stop_pending.add(contract_id)
+                
+                price = float(self._slot_price[self._contract_slots[contract_id]])
+                if position_info.position == Position.LONG:
+                    signal = SignalType.CLOSE_LONG
+                else:
+                    signal = SignalType.CLOSE_SHORT
+                logger.info("%s: 触发%s @ %s，提交平仓", position_info.symbol, reason, price)
+                await self.execute_signal(
+                    contract_id, position_info.symbol, signal, price, position_info.size, slippage
+                )
+    
     def get_position(self, contract_id: str) -> Position:
         """获取持仓状态"""
         if contract_id in self.positions:
@@ -360,9 +958,47 @@ class OrderManager:
         return self.positions
     
     def get_trade_history(self) -> List[Dict]:
-        """获取交易历史"""
-        return self.trade_history
+        """获取交易历史（从列式存储物化为字典列表）"""
+        n = self._n_trades
+        pnl = self._pnl_arr[:n]
+        size = self._size_arr[:n]
+        entry = self._entry_arr[:n]
+        pnl_pct = pnl / (entry * size) * 100
+        return [
+            {
+                'symbol': symbol,
+                'action': action,
+                'entry_price': entry_price,
+                'close_price': close_price,
+                'size': size,
+                'pnl': pnl,
+                'pnl_pct': pnl_pct,
+                'entry_time': datetime.fromtimestamp(entry_time),
+                'close_time': datetime.fromtimestamp(close_time)
+            }
+            for symbol, action, entry_price, close_price, size, pnl, pnl_pct, entry_time, close_time in zip(
+                self._trade_symbols[:n],
+                self._trade_actions[:n],
+                entry.tolist(),
+                self._close_arr[:n].tolist(),
+                size.tolist(),
+                pnl.tolist(),
+                pnl_pct.tolist(),
+                self._entry_time_arr[:n].tolist(),
+                self._close_time_arr[:n].tolist()
+            )
+        ]
     
-    def calculate_total_pnl(self) -> float:
-        """计算总盈亏"""
-        return sum(trade['pnl'] for trade in self.trade_history)
\ No newline at end of file
+    def calculate_total_pnl(self, exact: bool = False) -> float:
+        """
+        计算总盈亏
+        
+        Args:
+            exact: 为True时用math.fsum对全部交易精确求和，否则返回增量维护的累计值
+        
+        Returns:
+            总盈亏
+        """
+        if exact:
+            return math.fsum(self._pnl_arr[:self._n_trades].tolist())
+        return self._total_pnl
\ No newline at end of file
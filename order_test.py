@@ -4,7 +4,9 @@ EdgeX 订单功能测试程序
 """
 
 import asyncio
+import logging
 import os
+import sys
 import warnings
 from dotenv import load_dotenv
 from edgex_sdk import (
@@ -18,8 +20,15 @@ from edgex_sdk import (
     TimeInForce,
     GetOrderBookDepthParams
 )
+from order_manager import create_http_session, attach_http_session
+
+try:
+    import uvloop
+except ImportError:  # uvloop为可选依赖，缺失时使用默认事件循环
+    uvloop = None
 
 load_dotenv()
+logger = logging.getLogger(__name__)
 warnings.filterwarnings('ignore', message='Unclosed client session')
 warnings.filterwarnings('ignore', message='Unclosed connector')
 
@@ -31,6 +40,17 @@ class OrderTester:
         self.client = client
         self.test_contract_id = "10000001"  # BTC-USDT 合约
         self.created_order_ids = []  # 记录创建的订单ID，方便后续撤单
+        self._orderbook = None  # 缓存的订单簿，供需要市价的测试复用
+    
+    async def get_orderbook(self, refresh: bool = False) -> dict:
+        """获取订单簿深度（首次请求后缓存）"""
+        if self._orderbook is None or refresh:
+            orderbook_params = GetOrderBookDepthParams(
+                contract_id=self.test_contract_id,
+                limit=15
+            )
+            self._orderbook = await self.client.quote.get_order_book_depth(orderbook_params)
+        return self._orderbook
     
     async def test_limit_order(self):
         """💰 测试限价单下单"""
@@ -40,11 +60,7 @@ class OrderTester:
         
         try:
             # 先获取当前市场价格
-            orderbook_params = GetOrderBookDepthParams(
-                contract_id=self.test_contract_id,
-                limit=15
-            )
-            orderbook = await self.client.quote.get_order_book_depth(orderbook_params)
+            orderbook = await self.get_orderbook()
             
             if orderbook.get("code") == "SUCCESS":
                 data = orderbook.get("data", [])
@@ -97,10 +113,8 @@ class OrderTester:
                     else:
                         print(f"\n❌ 限价单创建失败: {result.get('errorParam', result)}")
             
-        except Exception as e:
-            print(f"\n❌ 测试失败: {str(e)}")
-            import traceback
-            traceback.print_exc()
+        except Exception:
+            logger.exception("❌ 测试失败")
     
     async def test_market_order(self):
         """⚡ 测试市价单下单"""
@@ -166,27 +180,30 @@ class OrderTester:
                 print(f"📊 活跃订单总数: {len(orders)}")
                 
                 if orders:
-                    print("\n活跃订单列表:")
-                    print("-" * 100)
-                    print(f"{'订单ID':<22} {'类型':<8} {'方向':<6} {'价格':<12} {'数量':<10} {'已成交':<10} {'状态':<15}")
-                    print("-" * 100)
-                    
-                    # 打印第一个订单的所有字段用于调试
-                    if orders:
-                        print(f"\n🔍 调试: 订单字段 = {list(orders[0].keys())}\n")
+                    # 整张表拼接后一次写出
+                    rows = [
+                        "\n活跃订单列表:",
+                        "-" * 100,
+                        f"{'订单ID':<22} {'类型':<8} {'方向':<6} {'价格':<12} {'数量':<10} {'已成交':<10} {'状态':<15}",
+                        "-" * 100,
+                        # 打印第一个订单的所有字段用于调试
+                        f"\n🔍 调试: 订单字段 = {list(orders[0].keys())}\n",
+                    ]
                     
                     for order in orders[:10]:  # 只显示前10个
-                        order_id = order.get("orderId") or order.get("id") or "N/A"
-                        order_type = order.get("type", "N/A")
-                        side = order.get("side", "N/A")
-                        price = order.get("price", "0")
-                        size = order.get("size", "0")
-                        filled_size = order.get("filledSize", "0")
-                        status = order.get("status", "N/A")
+                        g = order.get
+                        order_id = g("orderId") or g("id") or "N/A"
+                        order_type = g("type", "N/A")
+                        side = g("side", "N/A")
+                        price = g("price", "0")
+                        size = g("size", "0")
+                        filled_size = g("filledSize", "0")
+                        status = g("status", "N/A")
                         
-                        print(f"{order_id:<22} {order_type:<8} {side:<6} ${price:<11} {size:<10} {filled_size:<10} {status:<15}")
+                        rows.append(f"{order_id:<22} {order_type:<8} {side:<6} ${price:<11} {size:<10} {filled_size:<10} {status:<15}")
                     
-                    print("-" * 100)
+                    rows.append("-" * 100)
+                    sys.stdout.write("\n".join(rows) + "\n")
                 else:
                     print("\n暂无活跃订单")
                 
@@ -197,10 +214,8 @@ class OrderTester:
             else:
                 print(f"❌ 查询失败: {result.get('errorParam', result)}")
                 
-        except Exception as e:
-            print(f"\n❌ 测试失败: {str(e)}")
-            import traceback
-            traceback.print_exc()
+        except Exception:
+            logger.exception("❌ 测试失败")
     
     async def test_cancel_order(self):
         """❌ 测试撤单功能"""
@@ -231,10 +246,8 @@ class OrderTester:
             else:
                 print(f"\n❌ 撤单失败: {result.get('errorParam', result)}")
                 
-        except Exception as e:
-            print(f"\n❌ 测试失败: {str(e)}")
-            import traceback
-            traceback.print_exc()
+        except Exception:
+            logger.exception("❌ 测试失败")
     
     async def test_cancel_all_orders(self):
         """❌ 测试批量撤单"""
@@ -281,19 +294,23 @@ class OrderTester:
                 print(f"📊 历史成交记录数: {len(fills)}")
                 
                 if fills:
-                    print("\n成交记录:")
-                    print("-" * 90)
-                    print(f"{'订单ID':<22} {'方向':<6} {'价格':<12} {'数量':<10} {'手续费':<10} {'类型':<8} {'盈亏':<10}")
-                    print("-" * 90)
+                    # 整张表拼接后一次写出
+                    rows = [
+                        "\n成交记录:",
+                        "-" * 90,
+                        f"{'订单ID':<22} {'方向':<6} {'价格':<12} {'数量':<10} {'手续费':<10} {'类型':<8} {'盈亏':<10}",
+                        "-" * 90,
+                    ]
                     
                     for fill in fills[:10]:  # 只显示前10条
-                        order_id = fill.get("orderId", "N/A")
-                        side = fill.get("orderSide", "N/A")
-                        price = fill.get("fillPrice", "0")
-                        size = fill.get("fillSize", "0")
-                        fee = fill.get("fillFee", "0")
-                        direction = fill.get("direction", "N/A")  # MAKER 或 TAKER
-                        realize_pnl = fill.get("realizePnl", "0")
+                        g = fill.get
+                        order_id = g("orderId", "N/A")
+                        side = g("orderSide", "N/A")
+                        price = g("fillPrice", "0")
+                        size = g("fillSize", "0")
+                        fee = g("fillFee", "0")
+                        direction = g("direction", "N/A")  # MAKER 或 TAKER
+                        realize_pnl = g("realizePnl", "0")
                         
                         # 格式化盈亏显示
                         try:
@@ -307,9 +324,10 @@ class OrderTester:
                         except:
                             pnl_str = realize_pnl
                         
-                        print(f"{order_id:<22} {side:<6} ${price:<11} {size:<10} {fee:<10} {direction:<8} {pnl_str:<10}")
+                        rows.append(f"{order_id:<22} {side:<6} ${price:<11} {size:<10} {fee:<10} {direction:<8} {pnl_str:<10}")
                     
-                    print("-" * 90)
+                    rows.append("-" * 90)
+                    sys.stdout.write("\n".join(rows) + "\n")
                 else:
                     print("\n暂无历史成交记录")
                 
@@ -320,10 +338,8 @@ class OrderTester:
             else:
                 print(f"❌ 查询失败: {result.get('errorParam', result)}")
                 
-        except Exception as e:
-            print(f"\n❌ 测试失败: {str(e)}")
-            import traceback
-            traceback.print_exc()
+        except Exception:
+            logger.exception("❌ 测试失败")
 
 
 async def main():
@@ -359,26 +375,32 @@ async def main():
             stark_private_key=stark_private_key
         )
         
+        # 所有测试共享同一个HTTP会话（连接池长连接复用）
+        session = create_http_session()
+        attach_http_session(client, session)
+        
         # 创建测试器
         tester = OrderTester(client)
         
         # 运行所有测试
         await tester.test_limit_order()
-        await asyncio.sleep(1)  # 等待1秒
+        await asyncio.sleep(1)  # 写操作之间留出限速缓冲
         
         await tester.test_market_order()
-        await asyncio.sleep(1)
+        await asyncio.sleep(1)  # 等待订单状态同步后再查询
         
-        await tester.test_query_active_orders()
+        # 只读查询互不依赖，并发执行
+        await asyncio.gather(
+            tester.test_query_active_orders(),
+            tester.test_query_fill_history()
+        )
         await asyncio.sleep(1)
         
+        # 撤单依赖 created_order_ids，保持顺序执行
         await tester.test_cancel_order()
-        await asyncio.sleep(1)
+        await asyncio.sleep(1)  # 写操作之间留出限速缓冲
         
         await tester.test_cancel_all_orders()
-        await asyncio.sleep(1)
-        
-        await tester.test_query_fill_history()
         
         print("\n" + "=" * 70)
         print("✅ 所有订单功能测试完成！".center(70))
@@ -405,21 +427,18 @@ async def main():
         print("  4. 所有 API 调用都经过加密签名验证")
         print("  5. MAKER 订单提供流动性，手续费通常更优惠")
         
-    except Exception as e:
-        print(f"\n✗ 发生错误: {str(e)}")
-        import traceback
-        traceback.print_exc()
+    except Exception:
+        logger.exception("✗ 发生错误")
     
     finally:
-        if 'client' in locals():
-            try:
-                if hasattr(client, 'async_client'):
-                    if hasattr(client.async_client, 'session'):
-                        await client.async_client.session.close()
-            except Exception:
-                pass
-            await asyncio.sleep(0.1)
+        if 'session' in locals():
+            await session.close()
+            # 让底层SSL连接完成关闭
+            await asyncio.sleep(0)
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    if uvloop is not None:
+        uvloop.run(main())
+    else:
+        asyncio.run(main())
\ No newline at end of file
@@ -3,52 +3,148 @@
 处理价格和数量的精度对齐，确保符合交易所规则
 """
 
-from decimal import Decimal, ROUND_DOWN, ROUND_UP
+from decimal import Decimal, ROUND_DOWN
+from enum import IntEnum
+from functools import lru_cache
 from typing import Dict
 import logging
+import math
 
 logger = logging.getLogger(__name__)
 
 
+# 浮点缩放后视为整数的相对误差（如 100.3*10 = 1002.9999999999999）
+_SNAP_EPS = 1e-14
+
+
+def _floor_scaled(x: float) -> int:
+    """向下取整，浮点误差范围内的值按最近整数处理"""
+    nearest = round(x)
+    if abs(x - nearest) <= _SNAP_EPS * max(1.0, abs(x)):
+        return nearest
+    return math.floor(x)
+
+
+def _ceil_scaled(x: float) -> int:
+    """向上取整，浮点误差范围内的值按最近整数处理"""
+    nearest = round(x)
+    if abs(x - nearest) <= _SNAP_EPS * max(1.0, abs(x)):
+        return nearest
+    return math.ceil(x)
+
+
+@lru_cache(maxsize=128)
+def _price_precision(tick_size: float) -> int:
+    """从tick size计算价格精度（小数位数）"""
+    return max(0, -Decimal(str(tick_size)).as_tuple().exponent)
+
+
+def _make_price_rounder(tick_scale: int, tick_int: int, fmt: str, up: bool):
+    """
+    生成合约专用的价格对齐函数（精度参数作为默认参数常量绑定，调用时无需查表和分支）
+    
+    Args:
+        tick_scale: 价格放大倍数
+        tick_int: 放大后的tick整数
+        fmt: 价格格式化字符串
+        up: 是否向上对齐
+    """
+    if up:
+        def round_price(price: float, _s=tick_scale, _t=tick_int, _fmt=fmt, _ceil=_ceil_scaled) -> str:
+            return _fmt % (-(-_ceil(price * _s) // _t) * _t / _s)
+    else:
+        def round_price(price: float, _s=tick_scale, _t=tick_int, _fmt=fmt, _floor=_floor_scaled) -> str:
+            return _fmt % (_floor(price * _s) // _t * _t / _s)
+    return round_price
+
+
+def _make_size_rounder(size_scale: int, fmt: str):
+    """生成合约专用的数量对齐函数（向下对齐）"""
+    def round_size(size: float, _s=size_scale, _fmt=fmt, _floor=_floor_scaled) -> str:
+        return _fmt % (_floor(size * _s) / _s)
+    return round_size
+
+
+class RoundDirection(IntEnum):
+    """价格对齐方向"""
+    DOWN = 0
+    UP = 1
+
+
 class PrecisionManager:
     """精度管理器"""
     
+    __slots__ = ('contract_info',)
+    
     def __init__(self):
         self.contract_info: Dict[str, Dict] = {}
     
     def set_contract_info(self, contract_id: str, tick_size: float, size_precision: int):
         """设置合约精度信息"""
+        # 统一以字符串合约ID为键（与下单路径传入的ID一致）
+        contract_id = str(contract_id)
+        price_precision = _price_precision(tick_size)
+        tick_scale = 10 ** price_precision
+        tick_int = int(round(tick_size * tick_scale))
+        size_scale = 10 ** size_precision
+        price_fmt = f"%.{price_precision}f"
+        size_fmt = f"%.{size_precision}f"
         self.contract_info[contract_id] = {
             "tick_size": Decimal(str(tick_size)),
             "size_precision": size_precision,
-            "price_precision": self._get_price_precision(tick_size)
+            "price_precision": price_precision,
+            # 整数tick运算参数：价格放大tick_scale倍后按tick_int的整数倍对齐
+            "tick_scale": tick_scale,
+            "tick_int": tick_int,
+            "size_scale": size_scale,
+            "price_fmt": price_fmt,
+            "size_fmt": size_fmt,
+            # 按合约精度特化的对齐函数
+            "round_down": _make_price_rounder(tick_scale, tick_int, price_fmt, up=False),
+            "round_up": _make_price_rounder(tick_scale, tick_int, price_fmt, up=True),
+            "round_size": _make_size_rounder(size_scale, size_fmt),
+            # Decimal精确路径参数：数量量化单位及保留Decimal精度的格式化函数
+            "quantize": Decimal(1).scaleb(-size_precision),
+            "price_format": ("{:." + str(price_precision) + "f}").format,
+            "size_format": ("{:." + str(size_precision) + "f}").format
         }
         logger.info(f"设置合约 {contract_id} 精度: tick={tick_size}, size_precision={size_precision}")
     
-    def _get_price_precision(self, tick_size: float) -> int:
-        """从tick size计算价格精度"""
-        tick_str = str(tick_size)
-        if '.' in tick_str:
-            return len(tick_str.split('.')[1])
-        return 0
-    
-    def round_price(self, contract_id: str, price: float, direction: str = "down") -> str:
+    def round_price(
+        self,
+        contract_id: str,
+        price: float,
+        direction: int = RoundDirection.DOWN,
+        strict: bool = False
+    ) -> str:
         """
         价格精度对齐
         
         Args:
             contract_id: 合约ID
             price: 原始价格
-            direction: 对齐方向 ("down" 向下, "up" 向上)
+            direction: 对齐方向 (RoundDirection.DOWN 向下, RoundDirection.UP 向上)
+            strict: 为True时使用Decimal精确计算
         
         Returns:
             对齐后的价格字符串
         """
-        if contract_id not in self.contract_info:
+        info = self.contract_info.get(contract_id)
+        if info is None:
             logger.warning(f"合约 {contract_id} 精度信息未设置，使用原始价格")
             return str(price)
         
-        info = self.contract_info[contract_id]
+        if strict:
+            return self._round_price_decimal(info, price, direction)
+        
+        # 整数tick运算：先放大到最小价格单位，再按tick_int整除对齐
+        result = (info["round_up"] if direction else info["round_down"])(price)
+        
+        logger.debug("价格对齐: %s -> %s (方向:%s)", price, result, direction)
+        return result
+    
+    def _round_price_decimal(self, info: Dict, price: float, direction: int) -> str:
+        """使用Decimal的价格对齐"""
         tick_size = info["tick_size"]
         price_decimal = Decimal(str(price))
         
@@ -56,46 +152,52 @@ class PrecisionManager:
         ticks = price_decimal / tick_size
         
         # 根据方向对齐
-        if direction == "down":
-            aligned_ticks = int(ticks)
-        else:
+        if direction:
             aligned_ticks = int(ticks) + (1 if ticks > int(ticks) else 0)
+        else:
+            aligned_ticks = int(ticks)
         
         # 计算对齐后的价格
-        aligned_price = tick_size * Decimal(str(aligned_ticks))
+        aligned_price = tick_size * aligned_ticks
         
         # 格式化为字符串
-        precision = info["price_precision"]
-        result = f"{aligned_price:.{precision}f}"
+        result = info["price_format"](aligned_price)
         
-        logger.debug(f"价格对齐: {price} -> {result} (方向:{direction})")
+        logger.debug("价格对齐: %s -> %s (方向:%s)", price, result, direction)
         return result
     
-    def round_size(self, contract_id: str, size: float) -> str:
+    def round_size(self, contract_id: str, size: float, strict: bool = False) -> str:
         """
         数量精度对齐
         
         Args:
             contract_id: 合约ID
             size: 原始数量
+            strict: 为True时使用Decimal精确计算
         
         Returns:
             对齐后的数量字符串
         """
-        if contract_id not in self.contract_info:
+        info = self.contract_info.get(contract_id)
+        if info is None:
             logger.warning(f"合约 {contract_id} 精度信息未设置，使用原始数量")
             return str(size)
         
-        info = self.contract_info[contract_id]
-        precision = info["size_precision"]
+        if strict:
+            return self._round_size_decimal(info, size)
         
+        result = info["round_size"](size)
+        logger.debug("数量对齐: %s -> %s", size, result)
+        return result
+    
+    def _round_size_decimal(self, info: Dict, size: float) -> str:
+        """使用Decimal的数量对齐"""
         # 使用Decimal进行精确计算
         size_decimal = Decimal(str(size))
-        quantize_str = '0.' + '0' * (precision - 1) + '1'
-        rounded_size = size_decimal.quantize(Decimal(quantize_str), rounding=ROUND_DOWN)
+        rounded_size = size_decimal.quantize(info["quantize"], rounding=ROUND_DOWN)
         
-        result = f"{rounded_size:.{precision}f}"
-        logger.debug(f"数量对齐: {size} -> {result}")
+        result = info["size_format"](rounded_size)
+        logger.debug("数量对齐: %s -> %s", size, result)
         return result
     
     def calculate_order_value(self, contract_id: str, price: float, size: float) -> float:
@@ -120,7 +222,7 @@ class PrecisionManager:
         # 计算数量
         size = total_value / price
         
-        logger.debug(f"杠杆调整: 仓位={position_size}, 杠杆={leverage}, 价格={price}, 数量={size}")
+        logger.debug("杠杆调整: 仓位=%s, 杠杆=%s, 价格=%s, 数量=%s", position_size, leverage, price, size)
         return size
     
     def validate_order_size(self, contract_id: str, size: float, min_size: float = 0.001) -> bool:
@@ -5,12 +5,22 @@
 
 import asyncio
 import os
+import numpy as np
 import pandas as pd
 from datetime import datetime
 from edgex_sdk import Client
 from edgex_sdk.quote.client import GetKLineParams, KlineType, PriceType
 from dotenv import load_dotenv
-from typing import Dict, List
+from typing import Dict, List, Optional
+import aiohttp
+
+from order_manager import attach_http_session, create_http_session
+from rate_limiter import RateLimiter, rate_limiter
+
+try:
+    import pyarrow  # noqa: F401  (DataFrame.to_parquet 所需引擎)
+except ImportError:  # pyarrow为可选依赖，缺失时保存为CSV
+    pyarrow = None
 
 load_dotenv()
 
@@ -25,18 +35,41 @@ class DataPreparer:
         "4h": KlineType.HOUR_4,
     }
     
-    def __init__(self):
+    def __init__(self, limiter: RateLimiter = rate_limiter):
+        # 所有K线请求共用的限速器
+        self.limiter = limiter
+        
         self.client = Client(
             base_url=os.getenv("EDGEX_BASE_URL", "https://pro.edgex.exchange"),
             account_id=int(os.getenv("EDGEX_ACCOUNT_ID", "0")),
             stark_private_key=os.getenv("EDGEX_STARK_PRIVATE_KEY", "")
         )
         
+        # 所有分页下载共用的HTTP会话（在 async with 中创建）
+        self.session: Optional[aiohttp.ClientSession] = None
+        
         # 创建数据目录
         self.data_dir = "data"
         if not os.path.exists(self.data_dir):
             os.makedirs(self.data_dir)
     
+    async def __aenter__(self):
+        """创建共享HTTP会话，下载期间复用同一连接池"""
+        if self.session is None or self.session.closed:
+            self.session = create_http_session()
+            attach_http_session(self.client, self.session)
+        return self
+    
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+    
+    async def close(self):
+        """关闭共享HTTP会话"""
+        if self.session is not None and not self.session.closed:
+            await self.session.close()
+            # 让连接器完成底层连接的关闭
+            await asyncio.sleep(0)
+    
     async def download_klines(
         self,
         contract_id: str,
@@ -81,6 +114,7 @@ class DataPreparer:
                         offset_data=offset_data
                     )
                     
+                    await self.limiter.acquire()
                     result = await self.client.quote.get_k_line(params)
                     
                     if result.get("code") != "SUCCESS":
@@ -104,9 +138,6 @@ class DataPreparer:
                         print(f"  已获取所有可用数据")
                         break
                     
-                    # 避免请求过快
-                    await asyncio.sleep(0.5)
-                    
                 except Exception as e:
                     print(f"  批次 {batch+1} 异常: {str(e)}")
                     break
@@ -130,24 +161,52 @@ class DataPreparer:
             return None
     
     def _parse_klines(self, klines: List[Dict]) -> pd.DataFrame:
-        """解析K线数据"""
-        data = []
+        """解析K线数据（一次遍历收集各列，再整体转换类型）"""
+        ts, o, h, l, c, v = [], [], [], [], [], []
         for k in klines:
-            data.append({
-                'timestamp': pd.to_datetime(int(k.get('klineTime', 0)), unit='ms'),
-                'open': float(k.get('open', 0)),
-                'high': float(k.get('high', 0)),
-                'low': float(k.get('low', 0)),
-                'close': float(k.get('close', 0)),
-                'volume': float(k.get('size', 0))
-            })
-        
-        df = pd.DataFrame(data)
+            g = k.get
+            ts.append(g('klineTime', 0))
+            o.append(g('open', 0))
+            h.append(g('high', 0))
+            l.append(g('low', 0))
+            c.append(g('close', 0))
+            v.append(g('size', 0))
+        
+        df = pd.DataFrame(
+            {'open': o, 'high': h, 'low': l, 'close': c, 'volume': v}
+        ).astype('float64')
+        df.insert(0, 'timestamp', pd.to_datetime(np.asarray(ts, dtype=np.int64), unit='ms'))
         df.sort_values('timestamp', inplace=True)
         # 去重
         df = df.drop_duplicates(subset=['timestamp'], keep='last')
         return df
     
+    def save_history(self, df: pd.DataFrame, symbol: str, interval: str):
+        """
+        保存K线数据（安装pyarrow时写入zstd压缩的Parquet，否则写CSV）
+        
+        Parquet文件即 backtest.load_history 读取的缓存格式（timestamp为索引）
+        
+        Args:
+            df: K线数据
+            symbol: 交易对符号
+            interval: K线周期
+        """
+        if pyarrow is None:
+            self.save_to_csv(df, symbol, interval)
+            return
+        
+        if df is None or len(df) == 0:
+            print("警告: 没有数据可保存")
+            return
+        
+        if 'timestamp' in df.columns:
+            df = df.set_index('timestamp')
+        
+        filename = os.path.join(self.data_dir, f"{symbol}_{interval}.parquet")
+        df.to_parquet(filename, compression='zstd')
+        print(f"✓ 数据已保存到: {filename}\n")
+    
     def save_to_csv(self, df: pd.DataFrame, symbol: str, interval: str):
         """
         保存数据到CSV文件
@@ -168,6 +227,12 @@ class DataPreparer:
         df_to_save.to_csv(filename, index=False)
         print(f"✓ 数据已保存到: {filename}\n")
     
+    async def _download_and_save(self, contract_id: str, symbol: str, interval: str, total_size: int):
+        """下载单个交易对、单个周期的数据并保存（文件写入在线程中执行，不阻塞其他下载）"""
+        df = await self.download_klines(contract_id, symbol, interval, total_size)
+        if df is not None:
+            await asyncio.get_running_loop().run_in_executor(None, self.save_history, df, symbol, interval)
+    
     async def prepare_all_data(self, symbols: list, intervals: list, total_size: int = 500):
         """
         准备所有交易对的数据
@@ -181,19 +246,12 @@ class DataPreparer:
         print("开始准备回测数据")
         print("=" * 80)
         
-        for contract_id, symbol in symbols:
-            print(f"\n处理 {symbol}:")
-            
-            for interval in intervals:
-                # 下载数据（使用分页机制）
-                df = await self.download_klines(contract_id, symbol, interval, total_size)
-                
-                # 保存数据
-                if df is not None:
-                    self.save_to_csv(df, symbol, interval)
-                
-                # 等待一下，避免请求过快
-                await asyncio.sleep(1)
+        # 各交易对、各周期并发下载（分页请求由限速器控制频率），下载完成即保存
+        await asyncio.gather(*(
+            self._download_and_save(contract_id, symbol, interval, total_size)
+            for contract_id, symbol in symbols
+            for interval in intervals
+        ))
         
         print("\n" + "=" * 80)
         print("数据准备完成！")
@@ -217,19 +275,9 @@ async def main():
     # 建议至少300根，用于计算200周期MA
     total_size = 500
     
-    # 创建数据准备器
-    preparer = DataPreparer()
-    
-    # 下载数据
-    await preparer.prepare_all_data(symbols, intervals, total_size)
-    
-    # 关闭客户端
-    try:
-        if hasattr(preparer.client, 'async_client'):
-            if hasattr(preparer.client.async_client, 'session'):
-                await preparer.client.async_client.session.close()
-    except Exception:
-        pass
+    # 创建数据准备器并下载数据（退出时关闭共享HTTP会话）
+    async with DataPreparer() as preparer:
+        await preparer.prepare_all_data(symbols, intervals, total_size)
 
 
 if __name__ == "__main__":
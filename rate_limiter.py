@@ -5,12 +5,15 @@ API限速器
 
 import asyncio
 import time
-from collections import deque
 from typing import Callable, Any
 import logging
+import numpy as np
 
 logger = logging.getLogger(__name__)
 
+_SECOND_NS = 1_000_000_000
+_MINUTE_NS = 60 * _SECOND_NS
+
 
 class RateLimiter:
     """API限速器"""
@@ -26,9 +29,14 @@ class RateLimiter:
         self.max_per_second = max_per_second
         self.max_per_minute = max_per_minute
         
-        # 请求时间戳队列
-        self.second_queue = deque(maxlen=max_per_second)
-        self.minute_queue = deque(maxlen=max_per_minute)
+        # 请求时间戳环形缓冲区（单调时钟，纳秒）
+        # 写指针同时指向最早的时间戳（缓冲区写满后）
+        self._s_ring = np.zeros(max_per_second, dtype=np.int64)
+        self._m_ring = np.zeros(max_per_minute, dtype=np.int64)
+        self._s_head = 0
+        self._m_head = 0
+        self._s_count = 0
+        self._m_count = 0
         
         # 统计
         self.total_requests = 0
@@ -39,41 +47,41 @@ class RateLimiter:
     async def acquire(self):
         """
         获取请求许可（如有必要会等待）
+        
+        先同步预约发送时间并写入缓冲区，再一次性等待到该时间：
+        并发调用各自占用不同的槽位，不会在同一个最早时间戳上同时唤醒
         """
-        current_time = time.time()
+        now = time.monotonic_ns()
+        start = now
         
-        # 检查每秒限制
-        while len(self.second_queue) >= self.max_per_second:
-            oldest = self.second_queue[0]
-            wait_time = 1.0 - (current_time - oldest)
-            
-            if wait_time > 0:
-                logger.debug(f"达到秒级限速，等待 {wait_time:.2f}秒")
-                await asyncio.sleep(wait_time)
-                self.total_delays += 1
-                current_time = time.time()
-            else:
-                # 移除过期的时间戳
-                self.second_queue.popleft()
+        # 缓冲区已满时，本次请求不得早于窗口内最早请求 + 窗口长度
+        if self._s_count == self.max_per_second:
+            start = max(start, int(self._s_ring[self._s_head]) + _SECOND_NS)
+        send_at = start
+        if self._m_count == self.max_per_minute:
+            send_at = max(start, int(self._m_ring[self._m_head]) + _MINUTE_NS)
         
-        # 检查每分钟限制
-        while len(self.minute_queue) >= self.max_per_minute:
-            oldest = self.minute_queue[0]
-            wait_time = 60.0 - (current_time - oldest)
-            
-            if wait_time > 0:
-                logger.warning(f"达到分钟级限速，等待 {wait_time:.2f}秒")
-                await asyncio.sleep(wait_time)
-                self.total_delays += 1
-                current_time = time.time()
-            else:
-                # 移除过期的时间戳
-                self.minute_queue.popleft()
+        # 记录预约的请求时间（覆盖最早的时间戳）
+        self._s_ring[self._s_head] = send_at
+        self._s_head = (self._s_head + 1) % self.max_per_second
+        if self._s_count < self.max_per_second:
+            self._s_count += 1
+        
+        self._m_ring[self._m_head] = send_at
+        self._m_head = (self._m_head + 1) % self.max_per_minute
+        if self._m_count < self.max_per_minute:
+            self._m_count += 1
         
-        # 记录请求时间
-        self.second_queue.append(current_time)
-        self.minute_queue.append(current_time)
         self.total_requests += 1
+        
+        wait_ns = send_at - now
+        if wait_ns > 0:
+            if send_at > start:
+                logger.warning("达到分钟级限速，等待 %.2f秒", wait_ns / 1e9)
+            else:
+                logger.debug("达到秒级限速，等待 %.2f秒", wait_ns / 1e9)
+            self.total_delays += 1
+            await asyncio.sleep(wait_ns / 1e9)
     
     async def execute(self, func: Callable, *args, **kwargs) -> Any:
         """
@@ -95,8 +103,8 @@ class RateLimiter:
         return {
             'total_requests': self.total_requests,
             'total_delays': self.total_delays,
-            'current_second_queue': len(self.second_queue),
-            'current_minute_queue': len(self.minute_queue),
+            'current_second_queue': self._s_count,
+            'current_minute_queue': self._m_count,
             'delay_rate': self.total_delays / self.total_requests if self.total_requests > 0 else 0
         }
     
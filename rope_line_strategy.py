@@ -19,11 +19,19 @@
 
 import numpy as np
 import pandas as pd
-from typing import Dict
+from numpy.lib.stride_tricks import sliding_window_view
+from typing import Dict, List, Optional, Union
 from enum import Enum
 import logging
 from datetime import datetime
 
+from strategy_kernels import rope_backtest, KLINE_TIME, KLINE_HIGH, KLINE_LOW
+
+try:
+    import bottleneck as bn
+except ImportError:  # bottleneck为可选依赖，缺失时使用numpy滑动窗口视图
+    bn = None
+
 logger = logging.getLogger(__name__)
 
 
@@ -43,6 +51,42 @@ class Position(Enum):
     SHORT = "SHORT"  # 持空
 
 
+# strategy_kernels 信号编码对应的信号类型
+SIGNAL_TYPES = (
+    SignalType.NONE,
+    SignalType.LONG,
+    SignalType.SHORT,
+    SignalType.CLOSE_LONG,
+    SignalType.CLOSE_SHORT,
+)
+
+# 持仓状态在信号决策表中的列下标
+_POSITION_INDEX = {Position.EMPTY: 0, Position.LONG: 1, Position.SHORT: 2}
+
+# 持仓方向系数: 持多1, 持空-1, 空仓0
+_POSITION_SIGN = {Position.EMPTY: 0, Position.LONG: 1, Position.SHORT: -1}
+
+# 信号决策表: _TRANSITION[价格相对系绳线方向 + 1][持仓下标]
+# 方向: -1 价格低于系绳线, 0 等于, 1 高于; 持仓: 空仓/持多/持空
+_TRANSITION = (
+    (SignalType.SHORT, SignalType.SHORT, SignalType.NONE),
+    (SignalType.NONE, SignalType.NONE, SignalType.NONE),
+    (SignalType.LONG, SignalType.NONE, SignalType.LONG),
+)
+
+# 决策表的信号编码形式(SIGNAL_TYPES下标),供批量向量化查询
+_TRANSITION_CODES = np.array(
+    [[SIGNAL_TYPES.index(signal) for signal in row] for row in _TRANSITION], dtype=np.int8
+)
+
+# 决策表对应的动作说明(用于日志)
+_TRANSITION_DESC = (
+    ("实时价格跌破系绳线,空仓 -> 开空", "实时价格跌破系绳线,持多 -> 平多开空", None),
+    (None, None, None),
+    ("实时价格突破系绳线,空仓 -> 开多", None, "实时价格突破系绳线,持空 -> 平空开多"),
+)
+
+
 class RopeLineStrategy:
     """纯系绳线策略 - 完整修复版"""
     
@@ -60,7 +104,7 @@ class RopeLineStrategy:
         
         logger.info(f"纯系绳线策略初始化: 周期={rope_period}")
     
-    def calculate_rope_line(self, df: pd.DataFrame, exclude_current: bool = True) -> float:
+    def calculate_rope_line(self, df: Union[pd.DataFrame, np.ndarray], exclude_current: bool = True) -> float:
         """
         计算系绳线 - 修复版
         
@@ -69,7 +113,8 @@ class RopeLineStrategy:
         重要修复: 排除最后一根未完成的K线
         
         Args:
-            df: K线数据DataFrame,必须包含'high'和'low'列
+            df: K线数据DataFrame(必须包含'high'和'low'列),
+                或 WebsocketKlineFeed.window() 返回的K线数组
             exclude_current: 是否排除当前未完成K线(默认True)
         
         Returns:
@@ -78,77 +123,189 @@ class RopeLineStrategy:
         # 检查数据量
         required_length = self.rope_period + 1 if exclude_current else self.rope_period
         if len(df) < required_length:
-            logger.warning(f"数据不足,需要至少{required_length}根K线,当前只有{len(df)}根")
+            logger.warning("数据不足,需要至少%s根K线,当前只有%s根", required_length, len(df))
             return 0.0
         
         # ===== 关键修复: 排除最后一根未完成的K线 =====
+        # 只记录参与计算的K线数量（不切片，避免每次分配新的DataFrame）
         if exclude_current:
             # 使用除了最后一根之外的所有K线
-            df_for_calc = df.iloc[:-1]
-            logger.debug(f"排除当前未完成K线,使用前{len(df_for_calc)}根已完成K线计算系绳线")
+            end = len(df) - 1
+            logger.debug("排除当前未完成K线,使用前%s根已完成K线计算系绳线", end)
         else:
-            df_for_calc = df
-            logger.debug(f"使用全部{len(df_for_calc)}根K线计算系绳线(包含未完成K线)")
+            end = len(df)
+            logger.debug("使用全部%s根K线计算系绳线(包含未完成K线)", end)
         
-        # 再次检查数据是否足够
-        if len(df_for_calc) < self.rope_period:
-            logger.warning(f"排除当前K线后数据不足,需要至少{self.rope_period}根已完成K线")
-            return 0.0
-        
-        # 取最近rope_period根K线进行计算
-        recent_data = df_for_calc.iloc[-self.rope_period:]
-        
-        # 计算最高价和最低价
-        highest = recent_data['high'].max()
-        lowest = recent_data['low'].min()
+        # 取最近rope_period根K线进行计算（直接在numpy视图上求极值，避免pandas切片和归约开销）
+        start = end - self.rope_period
+        high, low = self._kline_high_low(df)
+        highest = float(high[start:end].max())
+        lowest = float(low[start:end].min())
         
         # 计算系绳线
         rope_line = (highest + lowest) / 2
         
         # 详细日志
-        logger.debug(f"系绳线计算详情:")
-        logger.debug(f"  - 原始K线总数: {len(df)}")
-        logger.debug(f"  - 用于计算K线数: {len(df_for_calc)} (排除{1 if exclude_current else 0}根未完成)")
-        logger.debug(f"  - 计算区间: 最近{self.rope_period}根已完成K线")
-        logger.debug(f"  - 时间范围: {recent_data.index[0]} 至 {recent_data.index[-1]}")
-        logger.debug(f"  - HHV(最高价): {highest:.2f}")
-        logger.debug(f"  - LLV(最低价): {lowest:.2f}")
-        logger.debug(f"  - 系绳线价格: {rope_line:.2f}")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("系绳线计算详情:")
+            logger.debug("  - 原始K线总数: %s", len(df))
+            logger.debug("  - 用于计算K线数: %s (排除%s根未完成)", end, 1 if exclude_current else 0)
+            logger.debug("  - 计算区间: 最近%s根已完成K线", self.rope_period)
+            times = self._kline_times(df)
+            logger.debug("  - 时间范围: %s 至 %s", times[start], times[end - 1])
+            logger.debug("  - HHV(最高价): %.2f", highest)
+            logger.debug("  - LLV(最低价): %.2f", lowest)
+            logger.debug("  - 系绳线价格: %.2f", rope_line)
         
         return rope_line
     
+    @staticmethod
+    def _kline_times(df: Union[pd.DataFrame, np.ndarray]):
+        """K线开盘时间数值序列(K线数组为毫秒时间戳列, DatetimeIndex为其int64视图)"""
+        if isinstance(df, np.ndarray):
+            return df[:, KLINE_TIME]
+        index = df.index
+        return index.asi8 if isinstance(index, pd.DatetimeIndex) else index.to_numpy()
+    
+    @staticmethod
+    def _kline_high_low(df: Union[pd.DataFrame, np.ndarray]):
+        """K线最高价、最低价序列(numpy视图)"""
+        if isinstance(df, np.ndarray):
+            return df[:, KLINE_HIGH], df[:, KLINE_LOW]
+        return df['high'].to_numpy(), df['low'].to_numpy()
+    
+    def precompute_rope_series(self, df: pd.DataFrame) -> np.ndarray:
+        """
+        一次性计算整段K线的系绳线序列（用于回测）
+        
+        第i个值与 calculate_rope_line(df.iloc[:i+1], exclude_current=True) 相同，
+        即由第i根之前的rope_period根已完成K线计算；数据不足的位置为NaN
+        
+        Args:
+            df: K线数据DataFrame,必须包含'high'和'low'列
+        
+        Returns:
+            系绳线序列
+        """
+        high = df['high'].to_numpy(dtype=np.float64)
+        low = df['low'].to_numpy(dtype=np.float64)
+        
+        # O(N)滑动窗口求HHV/LLV
+        if bn is not None:
+            hhv = bn.move_max(high, window=self.rope_period)
+            llv = bn.move_min(low, window=self.rope_period)
+        else:
+            # 零拷贝窗口视图上直接归约，不构造pandas滚动对象
+            hhv = np.full(len(high), np.nan)
+            llv = np.full(len(low), np.nan)
+            if len(high) >= self.rope_period:
+                hhv[self.rope_period - 1:] = sliding_window_view(high, self.rope_period).max(axis=1)
+                llv[self.rope_period - 1:] = sliding_window_view(low, self.rope_period).min(axis=1)
+        
+        # 右移一位，排除当前K线
+        rope = np.full(len(df), np.nan)
+        rope[1:] = (hhv[:-1] + llv[:-1]) / 2
+        return rope
+    
+    def run_backtest(
+        self,
+        df: pd.DataFrame,
+        start: Optional[int] = None,
+        stop_loss_pct: float = 0.0,
+        take_profit_pct: float = 0.0
+    ) -> pd.DataFrame:
+        """
+        批量回测：对整段K线逐根生成信号（数值内核，实盘仍使用 generate_signal）
+        
+        Args:
+            df: K线数据DataFrame,必须包含'high','low','close'列
+            start: 开始产生信号的K线下标,默认rope_period
+            stop_loss_pct: 止损比例(0表示不启用)
+            take_profit_pct: 止盈比例(0表示不启用)
+        
+        Returns:
+            与df同索引的DataFrame: signal(信号编码,见SIGNAL_TYPES), entry_price(持仓开仓价)
+        """
+        signals, entries = rope_backtest(
+            df['high'].to_numpy(dtype=np.float64),
+            df['low'].to_numpy(dtype=np.float64),
+            df['close'].to_numpy(dtype=np.float64),
+            self.rope_period,
+            self.rope_period if start is None else start,
+            stop_loss_pct,
+            take_profit_pct
+        )
+        return pd.DataFrame({'signal': signals, 'entry_price': entries}, index=df.index)
+    
+    def _resolve_rope_line(self, state: Dict, df, times, rope_line: Optional[float]) -> float:
+        """
+        获取合约当前的系绳线(排除未完成K线),失败时返回0.0
+        
+        系绳线只取决于已完成K线，最后一根已完成K线未变化时直接复用
+        """
+        if rope_line is None:
+            last_closed_ts = times[-2] if len(times) >= 2 else None
+            if last_closed_ts is not None and state.get('last_closed_ts') == last_closed_ts:
+                return state['rope_line']
+            
+            hi_window = state.get('hi_window')
+            if hi_window is not None and len(times) >= 3 and state['last_closed_ts'] == times[-3]:
+                # 恰好新收盘一根K线: 只把它写入固定窗口(覆盖最早的一根)
+                high, low = self._kline_high_low(df)
+                lo_window = state['lo_window']
+                idx = state['bar_count'] % self.rope_period
+                hi_window[idx] = high[-2]
+                lo_window[idx] = low[-2]
+                state['bar_count'] += 1
+                rope_line = float(hi_window.max() + lo_window.min()) / 2
+            else:
+                rope_line = self.calculate_rope_line(df, exclude_current=True)
+                if rope_line == 0.0:
+                    return rope_line
+                # 重建固定窗口(按时间顺序,下一根写入下标0即最早的一根)
+                high, low = self._kline_high_low(df)
+                end = len(times) - 1
+                state['hi_window'] = np.array(high[end - self.rope_period:end], dtype=np.float64)
+                state['lo_window'] = np.array(low[end - self.rope_period:end], dtype=np.float64)
+                state['bar_count'] = self.rope_period
+            state['last_closed_ts'] = last_closed_ts
+            return rope_line
+        if np.isnan(rope_line):
+            return 0.0
+        return rope_line
+    
     def generate_signal(
         self, 
         contract_id: str,
-        df: pd.DataFrame,
+        df: Union[pd.DataFrame, np.ndarray],
         current_position: Position,
-        current_price: float
+        current_price: float,
+        rope_line: Optional[float] = None
     ) -> SignalType:
         """
         生成交易信号 - 基于实时价格
         
         Args:
             contract_id: 合约ID
-            df: K线历史数据
+            df: K线历史数据(DataFrame或 WebsocketKlineFeed.window() 返回的K线数组)
             current_position: 当前持仓状态
             current_price: 当前实时价格(不是收盘价,是实时市场价格)
+            rope_line: 预先计算好的系绳线(如 precompute_rope_series 的结果),为None时按df计算
         
         Returns:
             交易信号
         """
+        # 记录状态
+        state = self.contract_states.setdefault(contract_id, {})
+        times = self._kline_times(df)
+        
         # 计算系绳线(排除未完成K线)
-        rope_line = self.calculate_rope_line(df, exclude_current=True)
+        rope_line = self._resolve_rope_line(state, df, times, rope_line)
         
         if rope_line == 0.0:
-            logger.warning(f"{contract_id}: 系绳线计算失败,数据不足")
+            logger.warning("%s: 系绳线计算失败,数据不足", contract_id)
             return SignalType.NONE
         
-        # 记录状态
-        if contract_id not in self.contract_states:
-            self.contract_states[contract_id] = {}
-        
-        state = self.contract_states[contract_id]
-        
         # 保存上一次的价格位置(用于判断穿越)
         prev_price = state.get('current_price', current_price)
         prev_rope = state.get('rope_line', rope_line)
@@ -159,65 +316,100 @@ class RopeLineStrategy:
         state['last_update_time'] = datetime.now()
         
         # 检查是否在同一周期内已经发出信号(防止重复信号)
-        current_timestamp = df.index[-1]
-        if 'last_signal_time' in state and state['last_signal_time'] == current_timestamp:
-            logger.debug(f"{contract_id}: 当前周期已有信号,跳过")
+        current_bar_id = times[-1]
+        if state.get('last_signal_bar_id') == current_bar_id:
+            logger.debug("%s: 当前周期已有信号,跳过", contract_id)
             return SignalType.NONE
         
-        signal = SignalType.NONE
-        
         # ========================================
-        # 策略逻辑 - 基于实时价格与系绳线的关系
+        # 策略逻辑 - 基于实时价格与系绳线的关系（查决策表）
         # ========================================
+        sign = int(current_price > rope_line) - int(current_price < rope_line)
+        pos_idx = _POSITION_INDEX[current_position]
+        signal = _TRANSITION[sign + 1][pos_idx]
         
-        # 情况1: 实时价格突破系绳线(向上)
-        if current_price > rope_line:
-            logger.debug(f"{contract_id}: 实时价格在系绳线上方 {current_price:.2f} > {rope_line:.2f}")
-            
-            if current_position == Position.EMPTY:
-                # 空仓 -> 开多
-                signal = SignalType.LONG
-                logger.info(f"{contract_id}: 实时价格突破系绳线,空仓 -> 开多 (价格:{current_price:.2f}, 系绳线:{rope_line:.2f})")
-            
-            elif current_position == Position.SHORT:
-                # 持空 -> 平空开多
-                signal = SignalType.LONG
-                logger.info(f"{contract_id}: 实时价格突破系绳线,持空 -> 平空开多 (价格:{current_price:.2f}, 系绳线:{rope_line:.2f})")
+        if signal is SignalType.NONE:
+            logger.debug("%s: 价格 %.2f, 系绳线 %.2f, 持仓 %s, 不做动作",
+                         contract_id, current_price, rope_line, current_position.value)
+        else:
+            logger.info("%s: %s (价格:%.2f, 系绳线:%.2f)",
+                        contract_id, _TRANSITION_DESC[sign + 1][pos_idx], current_price, rope_line)
+            # 记录信号时间
+            state['last_signal_bar_id'] = current_bar_id
+            logger.info("%s: 生成信号 %s", contract_id, signal.value)
+        
+        return signal
+    
+    def generate_signals_batch(
+        self,
+        contract_ids: List[str],
+        dfs: List[Union[pd.DataFrame, np.ndarray]],
+        positions: List[Position],
+        prices: List[float],
+        rope_lines: Optional[np.ndarray] = None
+    ) -> List[SignalType]:
+        """
+        批量生成多个合约的交易信号 - 规则与 generate_signal 相同
+        
+        系绳线逐合约取缓存,价格与系绳线比较及决策表查询对全部合约一次向量化完成
+        
+        Args:
+            contract_ids: 合约ID列表
+            dfs: 各合约K线历史数据
+            positions: 各合约当前持仓状态
+            prices: 各合约当前实时价格
+            rope_lines: 预先计算好的系绳线数组,为None时按dfs计算
+        
+        Returns:
+            与contract_ids顺序一致的信号列表
+        """
+        n = len(contract_ids)
+        states = [self.contract_states.setdefault(cid, {}) for cid in contract_ids]
+        times = [self._kline_times(df) for df in dfs]
+        
+        ropes = np.empty(n, dtype=np.float64)
+        for i in range(n):
+            ropes[i] = self._resolve_rope_line(
+                states[i], dfs[i], times[i], None if rope_lines is None else rope_lines[i]
+            )
+        
+        # 向量化决策: 价格相对系绳线方向 x 持仓 -> 信号编码
+        price_arr = np.asarray(prices, dtype=np.float64)
+        sign = (price_arr > ropes).astype(np.int8) - (price_arr < ropes).astype(np.int8)
+        pos_idx = np.fromiter((_POSITION_INDEX[p] for p in positions), dtype=np.int8, count=n)
+        codes = _TRANSITION_CODES[sign + 1, pos_idx]
+        codes[ropes == 0.0] = 0
+        
+        now = datetime.now()
+        signals = [SignalType.NONE] * n
+        for i in range(n):
+            contract_id = contract_ids[i]
+            state = states[i]
+            if ropes[i] == 0.0:
+                logger.warning("%s: 系绳线计算失败,数据不足", contract_id)
+                continue
             
-            elif current_position == Position.LONG:
-                # 已持多,不做动作
-                logger.debug(f"{contract_id}: 已持多,继续持有")
-                signal = SignalType.NONE
-        
-        # 情况2: 实时价格低于系绳线(向下)
-        elif current_price < rope_line:
-            logger.debug(f"{contract_id}: 实时价格在系绳线下方 {current_price:.2f} < {rope_line:.2f}")
+            state['rope_line'] = float(ropes[i])
+            state['current_price'] = prices[i]
+            state['last_update_time'] = now
             
-            if current_position == Position.EMPTY:
-                # 空仓 -> 开空
-                signal = SignalType.SHORT
-                logger.info(f"{contract_id}: 实时价格跌破系绳线,空仓 -> 开空 (价格:{current_price:.2f}, 系绳线:{rope_line:.2f})")
+            if not codes[i]:
+                continue
             
-            elif current_position == Position.LONG:
-                # 持多 -> 平多开空
-                signal = SignalType.SHORT
-                logger.info(f"{contract_id}: 实时价格跌破系绳线,持多 -> 平多开空 (价格:{current_price:.2f}, 系绳线:{rope_line:.2f})")
+            # 同一周期内已经发出信号时跳过
+            current_bar_id = times[i][-1]
+            if state.get('last_signal_bar_id') == current_bar_id:
+                logger.debug("%s: 当前周期已有信号,跳过", contract_id)
+                continue
             
-            elif current_position == Position.SHORT:
-                # 已持空,不做动作
-                logger.debug(f"{contract_id}: 已持空,继续持有")
-                signal = SignalType.NONE
-        
-        else:
-            # 价格正好等于系绳线(极少情况)
-            logger.debug(f"{contract_id}: 价格等于系绳线 {current_price:.2f} = {rope_line:.2f}")
+            signal = SIGNAL_TYPES[codes[i]]
+            logger.info("%s: %s (价格:%.2f, 系绳线:%.2f)",
+                        contract_id, _TRANSITION_DESC[sign[i] + 1][pos_idx[i]], prices[i], ropes[i])
+            state['last_signal_bar_id'] = current_bar_id
+            logger.info("%s: 生成信号 %s", contract_id, signal.value)
+            signals[i] = signal
         
-        # 记录信号时间
-        if signal != SignalType.NONE:
-            state['last_signal_time'] = current_timestamp
-            logger.info(f"{contract_id}: 生成信号 {signal.value}")
-        
-        return signal
+        return signals
     
     def check_stop_loss(
         self,
@@ -240,20 +432,15 @@ class RopeLineStrategy:
         Returns:
             是否触发止损
         """
-        if position == Position.LONG:
-            # 多单止损: 价格下跌超过止损比例
-            loss_pct = (entry_price - current_price) / entry_price
-            if loss_pct >= stop_loss_pct:
-                logger.info(f"{contract_id}: 多单触发止损 {loss_pct*100:.2f}%")
-                return True
-        
-        elif position == Position.SHORT:
-            # 空单止损: 价格上涨超过止损比例
-            loss_pct = (current_price - entry_price) / entry_price
-            if loss_pct >= stop_loss_pct:
-                logger.info(f"{contract_id}: 空单触发止损 {loss_pct*100:.2f}%")
-                return True
-        
+        # 多单为正、空单为负的方向系数,亏损比例 = 方向 * (开仓价 - 当前价) / 开仓价
+        sign = _POSITION_SIGN[position]
+        if not sign:
+            return False
+        loss_pct = sign * (entry_price - current_price) / entry_price
+        if loss_pct >= stop_loss_pct:
+            if logger.isEnabledFor(logging.INFO):
+                logger.info("%s: %s单触发止损 %.2f%%", contract_id, '多' if sign > 0 else '空', loss_pct * 100)
+            return True
         return False
     
     def check_take_profit(
@@ -277,20 +464,14 @@ class RopeLineStrategy:
         Returns:
             是否触发止盈
         """
-        if position == Position.LONG:
-            # 多单止盈: 价格上涨超过止盈比例
-            profit_pct = (current_price - entry_price) / entry_price
-            if profit_pct >= take_profit_pct:
-                logger.info(f"{contract_id}: 多单触发止盈 {profit_pct*100:.2f}%")
-                return True
-        
-        elif position == Position.SHORT:
-            # 空单止盈: 价格下跌超过止盈比例
-            profit_pct = (entry_price - current_price) / entry_price
-            if profit_pct >= take_profit_pct:
-                logger.info(f"{contract_id}: 空单触发止盈 {profit_pct*100:.2f}%")
-                return True
-        
+        sign = _POSITION_SIGN[position]
+        if not sign:
+            return False
+        profit_pct = sign * (current_price - entry_price) / entry_price
+        if profit_pct >= take_profit_pct:
+            if logger.isEnabledFor(logging.INFO):
+                logger.info("%s: %s单触发止盈 %.2f%%", contract_id, '多' if sign > 0 else '空', profit_pct * 100)
+            return True
         return False
     
     def get_state(self, contract_id: str) -> Dict:
@@ -399,28 +580,18 @@ if __name__ == "__main__":
     
     print(f"生成扩展数据: {len(df_extended)}根K线用于模拟")
     
-    current_position = Position.EMPTY
     trade_count = 0
     
-    # 从第51根开始测试（前51根用于计算系绳线）
-    for i in range(51, 61):
-        current_data = df_extended.iloc[:i+1]
-        current_price = df_extended['close'].iloc[i]
-        
-        signal = strategy.generate_signal(
-            "10000001",
-            current_data,
-            current_position,
-            current_price
-        )
-        
-        if signal == SignalType.LONG and current_position != Position.LONG:
-            print(f"{df_extended.index[i]}: 开多 @ {current_price:.2f}")
-            current_position = Position.LONG
+    # 从第51根开始测试（前51根用于计算系绳线），整段交由回测内核计算
+    result = strategy.run_backtest(df_extended, start=51)
+    
+    for timestamp, code, entry_price in zip(result.index, result['signal'], result['entry_price']):
+        signal = SIGNAL_TYPES[code]
+        if signal == SignalType.LONG:
+            print(f"{timestamp}: 开多 @ {entry_price:.2f}")
             trade_count += 1
-        elif signal == SignalType.SHORT and current_position != Position.SHORT:
-            print(f"{df_extended.index[i]}: 开空 @ {current_price:.2f}")
-            current_position = Position.SHORT
+        elif signal == SignalType.SHORT:
+            print(f"{timestamp}: 开空 @ {entry_price:.2f}")
             trade_count += 1
     
     if trade_count == 0:
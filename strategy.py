@@ -5,27 +5,116 @@
 
 import numpy as np
 import pandas as pd
-from typing import Dict, List, Tuple, Optional
-from enum import Enum
+from collections import deque
+from typing import Dict, List, Tuple, Optional, Union
+from enum import IntEnum
+import hashlib
 import logging
+import math
+import os
+
+from strategy_kernels import (
+    KLINE_TIME, KLINE_CLOSE, KLINE_HIGH, KLINE_LOW, mbo_rope_series, last_mbi_rope_batch
+)
 
 logger = logging.getLogger(__name__)
 
+# 指标磁盘缓存最多保留的文件数，超出时按修改时间淘汰最旧的
+INDICATOR_CACHE_MAX_FILES = 64
+# 指标内核算法变化时递增，使旧缓存失效
+_INDICATOR_CACHE_VERSION = 1
+
+
+def _evict_indicator_cache(cache_dir: str, max_files: int = INDICATOR_CACHE_MAX_FILES):
+    """
+    淘汰超出数量上限的指标缓存文件
+    
+    Args:
+        cache_dir: 缓存目录
+        max_files: 最多保留的缓存文件数
+    """
+    entries = []
+    for entry in os.scandir(cache_dir):
+        if entry.name.endswith('.npy'):
+            try:
+                entries.append((entry.stat().st_mtime, entry.path))
+            except OSError:
+                continue
+    
+    if len(entries) <= max_files:
+        return
+    
+    entries.sort()
+    for _, path in entries[:len(entries) - max_files]:
+        try:
+            os.remove(path)
+        except OSError:
+            # 可能已被并发回测删除
+            pass
+
+
+class SignalType(IntEnum):
+    """信号类型（整数编码与 strategy_kernels.SIGNAL_* 一致，名称见 .name）"""
+    NONE = 0
+    LONG = 1  # 开多/持多
+    SHORT = 2  # 开空/持空
+    CLOSE_LONG = 3  # 平多
+    CLOSE_SHORT = 4  # 平空
 
-class SignalType(Enum):
-    """信号类型"""
-    NONE = "NONE"
-    LONG = "LONG"  # 开多/持多
-    SHORT = "SHORT"  # 开空/持空
-    CLOSE_LONG = "CLOSE_LONG"  # 平多
-    CLOSE_SHORT = "CLOSE_SHORT"  # 平空
 
+class Position(IntEnum):
+    """持仓状态（整数编码与回测内核 _run_core 一致，名称见 .name）"""
+    EMPTY = 0  # 空仓
+    LONG = 1  # 持多
+    SHORT = 2  # 持空
 
-class Position(Enum):
-    """持仓状态"""
-    EMPTY = "EMPTY"  # 空仓
-    LONG = "LONG"  # 持多
-    SHORT = "SHORT"  # 持空
+
+class ContractState:
+    """单个合约的策略状态（槽位属性，代替逐字段的字典查找）"""
+    
+    # 显式声明槽位（dataclass的slots参数需要Python 3.10+，且槽位类不能带类级默认值）
+    __slots__ = (
+        'mbo', 'mbi', 'rope_line', 'current_price', 'ready', 'last_signal_bar_id', 'indicator_cache',
+        'ma_short_closes', 'ma_long_closes', 'ma_short_sum', 'ma_long_sum', 'ma_updates', 'ma_last_bar',
+        'rope_max_dq', 'rope_min_dq', 'rope_bar_count', 'rope_last_bar',
+    )
+    
+    def __init__(self):
+        # 最近一次信号计算结果
+        self.mbo: float = float('nan')
+        self.mbi: float = float('nan')
+        self.rope_line: float = float('nan')
+        self.current_price: float = float('nan')
+        # K线数量已满足预热要求（满足后不再检查）
+        self.ready: bool = False
+        # 上次发出信号的K线编号（同一K线只发一次信号）
+        self.last_signal_bar_id: Optional[float] = None
+        # (当前K线键, mbo, mbi, 系绳线)，当前K线未变化时复用
+        self.indicator_cache: Optional[tuple] = None
+        # 均线增量状态: 已完成K线收盘价队列及其累加和
+        self.ma_short_closes: Optional[deque] = None
+        self.ma_long_closes: Optional[deque] = None
+        self.ma_short_sum: float = 0.0
+        self.ma_long_sum: float = 0.0
+        self.ma_updates: int = 0  # 自上次精确求和以来的增量更新次数
+        self.ma_last_bar: Optional[float] = None
+        # 系绳线增量状态: 最高/最低价单调队列
+        self.rope_max_dq: Optional[deque] = None
+        self.rope_min_dq: Optional[deque] = None
+        self.rope_bar_count: int = 0
+        self.rope_last_bar: Optional[float] = None
+    
+    def __repr__(self) -> str:
+        return (f"ContractState(mbo={self.mbo}, mbi={self.mbi}, rope_line={self.rope_line}, "
+                f"current_price={self.current_price}, ready={self.ready}, "
+                f"last_signal_bar_id={self.last_signal_bar_id})")
+
+
+# 批量信号内核可直接读取的价格精度（其他类型先转为float64）
+_KERNEL_PRICE_DTYPES = (np.dtype(np.float32), np.dtype(np.float64))
+
+# 按Position编码索引的方向系数: 空仓0, 持多1, 持空-1
+_POSITION_SIGN = (0, 1, -1)
 
 
 class Strategy:
@@ -44,79 +133,320 @@ class Strategy:
         self.ma_long = ma_long
         self.rope_period = rope_period
         
+        # 能算出MBI和系绳线所需的最少K线数，不足时跳过整个指标计算
+        self.warmup_bars = max(ma_long + 1, ma_short + 1, rope_period)
+        
         # 每个合约的状态
-        self.contract_states: Dict[str, Dict] = {}
+        self.contract_states: Dict[str, ContractState] = {}
         
         logger.info(f"策略初始化: MA({ma_short},{ma_long}), 系绳线周期={rope_period}")
     
-    def calculate_mbo_mbi(self, df: pd.DataFrame) -> Tuple[float, float]:
+    def calculate_mbo_mbi_np(self, close: np.ndarray) -> Tuple[float, float]:
         """
-        计算MBO和MBI指标
+        计算MBO和MBI指标（numpy版本）
         
         MBO = MA(25) - MA(200)
         MBI = 当前MBO - 上一个MBO
         
         Args:
-            df: K线数据DataFrame，必须包含'close'列
+            close: 收盘价数组(float64)
         
         Returns:
-            (mbo, mbi) 元组
+            (mbo, mbi) 元组，K线不足ma_long+1根时mbi为NaN
         """
-        if len(df) < self.ma_long:
-            logger.warning(f"数据不足，需要至少{self.ma_long}根K线")
+        n = len(close)
+        if n < self.ma_long:
+            logger.warning("数据不足，需要至少%s根K线", self.ma_long)
             return 0.0, 0.0
         
-        # 创建副本避免警告
-        df = df.copy()
+        ma_short, ma_long = self.ma_short, self.ma_long
+        mbo = float(np.add.reduce(close[n - ma_short:]) / ma_short
+                    - np.add.reduce(close[n - ma_long:]) / ma_long)
+        if n > ma_long:
+            prev_mbo = (np.add.reduce(close[n - 1 - ma_short:n - 1]) / ma_short
+                        - np.add.reduce(close[n - 1 - ma_long:n - 1]) / ma_long)
+            mbi = mbo - float(prev_mbo)
+        else:
+            mbi = float('nan')
         
-        # 计算移动平均
-        df['ma_short'] = df['close'].rolling(window=self.ma_short).mean()
-        df['ma_long'] = df['close'].rolling(window=self.ma_long).mean()
+        logger.debug("MBO=%.2f, MBI=%.2f", mbo, mbi)
+        return mbo, mbi
+    
+    def calculate_mbo_mbi(self, df: pd.DataFrame) -> Tuple[float, float]:
+        """
+        计算MBO和MBI指标
         
-        # 计算MBO
-        df['mbo'] = df['ma_short'] - df['ma_long']
+        Args:
+            df: K线数据DataFrame，必须包含'close'列
         
-        # 计算MBI（当前MBO - 上一个MBO）
-        df['mbi'] = df['mbo'].diff()
+        Returns:
+            (mbo, mbi) 元组
+        """
+        return self.calculate_mbo_mbi_np(df['close'].to_numpy(dtype=np.float64))
+    
+    def _incremental_mbo_mbi(self, state: ContractState, times, closes: np.ndarray) -> Tuple[float, float]:
+        """
+        增量计算MBO和MBI（与 calculate_mbo_mbi 结果相同）
+        
+        状态中保存最近ma_short/ma_long根已完成K线的收盘价及其累加和，新收盘一根K线时
+        只减去移出的收盘价、加上新收盘价；当前K线的收盘价在计算时临时计入
         
-        # 获取最新值
-        mbo = df['mbo'].iloc[-1]
-        mbi = df['mbi'].iloc[-1]
+        Args:
+            state: 合约状态
+            times: K线开盘时间序列
+            closes: 收盘价数组
         
-        logger.debug(f"MBO={mbo:.2f}, MBI={mbi:.2f}")
+        Returns:
+            (mbo, mbi) 元组
+        """
+        n = len(closes)
+        if n <= self.ma_long:
+            return self.calculate_mbo_mbi_np(closes)
+        
+        last_closed = times[-2]
+        if state.ma_last_bar != last_closed:
+            short_q = state.ma_short_closes
+            if short_q is not None and state.ma_last_bar == times[-3]:
+                # 恰好新收盘一根K线
+                new_close = float(closes[-2])
+                state.ma_short_sum += new_close - short_q[0]
+                short_q.append(new_close)
+                long_q = state.ma_long_closes
+                state.ma_long_sum += new_close - long_q[0]
+                long_q.append(new_close)
+                state.ma_updates += 1
+                if state.ma_updates >= self.ma_long:
+                    # 每整窗重新精确求和一次，消除加减累积的舍入误差（摊销O(1)）
+                    state.ma_short_sum = math.fsum(short_q)
+                    state.ma_long_sum = math.fsum(long_q)
+                    state.ma_updates = 0
+            else:
+                # 首次计算或数据不连续时重建
+                short_q = deque(closes[n - 1 - self.ma_short:n - 1].tolist(), maxlen=self.ma_short)
+                long_q = deque(closes[n - 1 - self.ma_long:n - 1].tolist(), maxlen=self.ma_long)
+                state.ma_short_closes = short_q
+                state.ma_long_closes = long_q
+                state.ma_short_sum = math.fsum(short_q)
+                state.ma_long_sum = math.fsum(long_q)
+                state.ma_updates = 0
+            state.ma_last_bar = last_closed
+        
+        short_sum = state.ma_short_sum
+        long_sum = state.ma_long_sum
+        current = float(closes[-1])
+        
+        # 上一根K线的MBO只由已完成K线决定；当前MBO窗口移出最早一根、计入当前K线
+        prev_mbo = short_sum / self.ma_short - long_sum / self.ma_long
+        mbo = ((short_sum - state.ma_short_closes[0] + current) / self.ma_short
+               - (long_sum - state.ma_long_closes[0] + current) / self.ma_long)
+        mbi = mbo - prev_mbo
+        
+        logger.debug("MBO=%.2f, MBI=%.2f", mbo, mbi)
         return mbo, mbi
     
-    def calculate_rope_line(self, df: pd.DataFrame) -> float:
+    def calculate_rope_line_np(self, high: np.ndarray, low: np.ndarray) -> float:
         """
-        计算系绳线指标
+        计算系绳线指标（numpy版本）
         
         MS = (HHV(H, 50) + LLV(L, 50)) / 2
         
         Args:
-            df: K线数据DataFrame，必须包含'high'和'low'列
+            high: 最高价数组
+            low: 最低价数组
         
         Returns:
             系绳线价格
         """
-        if len(df) < self.rope_period:
-            logger.warning(f"数据不足，需要至少{self.rope_period}根K线")
+        if len(high) < self.rope_period:
+            logger.warning("数据不足，需要至少%s根K线", self.rope_period)
             return 0.0
         
-        # 计算过去N期的最高价和最低价
-        highest = df['high'].rolling(window=self.rope_period).max()
-        lowest = df['low'].rolling(window=self.rope_period).min()
+        # 最近N期的最高价和最低价
+        result = (float(high[-self.rope_period:].max()) + float(low[-self.rope_period:].min())) / 2
+        logger.debug("系绳线=%.2f", result)
+        return result
+    
+    def calculate_rope_line(self, df: pd.DataFrame) -> float:
+        """
+        计算系绳线指标
+        
+        Args:
+            df: K线数据DataFrame，必须包含'high'和'low'列
+        
+        Returns:
+            系绳线价格
+        """
+        return self.calculate_rope_line_np(df['high'].to_numpy(), df['low'].to_numpy())
+    
+    def precompute_indicators(self, df: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        一次性计算整段K线的MBO、MBI和系绳线序列（用于回测）
+        
+        第i个值与 calculate_mbo_mbi / calculate_rope_line 对前i+1根K线的结果相同，
+        数据不足的位置为NaN
+        
+        Args:
+            df: K线数据DataFrame，必须包含'close','high','low'列
+        
+        Returns:
+            (mbo, mbi, rope) 序列
+        """
+        return mbo_rope_series(
+            np.ascontiguousarray(df['close'].to_numpy(np.float64)),
+            np.ascontiguousarray(df['high'].to_numpy(np.float64)),
+            np.ascontiguousarray(df['low'].to_numpy(np.float64)),
+            self.ma_short,
+            self.ma_long,
+            self.rope_period
+        )
+    
+    def compute_series(
+        self,
+        df: pd.DataFrame,
+        cache_dir: Optional[str] = None
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        带磁盘缓存的 precompute_indicators
+        
+        以K线价格和策略参数的哈希作为缓存键，命中时以内存映射只读加载，
+        重复回测同一段数据时跳过指标计算
+        
+        Args:
+            df: K线数据DataFrame，必须包含'close','high','low'列
+            cache_dir: 缓存目录，为None时不使用缓存（默认不启用）
+        
+        Returns:
+            (mbo, mbi, rope) 序列（命中缓存时为只读视图）
+        """
+        if cache_dir is None:
+            return self.precompute_indicators(df)
+        
+        close = np.ascontiguousarray(df['close'].to_numpy(np.float64))
+        high = np.ascontiguousarray(df['high'].to_numpy(np.float64))
+        low = np.ascontiguousarray(df['low'].to_numpy(np.float64))
+        
+        digest = hashlib.blake2b(digest_size=20)
+        for column in (close, high, low):
+            digest.update(column.data)
+        digest.update(np.array(
+            [_INDICATOR_CACHE_VERSION, self.ma_short, self.ma_long, self.rope_period], dtype=np.int64
+        ).data)
+        path = os.path.join(cache_dir, f"{digest.hexdigest()}.npy")
+        
+        try:
+            series = np.load(path, mmap_mode='r')
+            if series.shape == (3, len(close)):
+                logger.debug("指标缓存命中: %s", path)
+                return series[0], series[1], series[2]
+        except (OSError, ValueError):
+            pass
+        
+        mbo, mbi, rope = mbo_rope_series(close, high, low, self.ma_short, self.ma_long, self.rope_period)
+        
+        # 先写临时文件再原子替换，避免并发回测读到半截文件
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            with open(tmp_path, 'wb') as f:
+                np.save(f, np.stack((mbo, mbi, rope)))
+            os.replace(tmp_path, path)
+            _evict_indicator_cache(cache_dir)
+        except OSError as e:
+            logger.warning("写入指标缓存失败: %s", e)
+        finally:
+            # 写入失败时清理残留的临时文件（替换成功后该文件已不存在）
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+        return mbo, mbi, rope
+    
+    @staticmethod
+    def _kline_columns(df: Union[pd.DataFrame, np.ndarray]):
+        """
+        取出 (开盘时间, 收盘价, 最高价, 最低价) 序列
+        
+        开盘时间为数值序列：K线数组为毫秒时间戳列，DatetimeIndex 为其int64视图（按索引精度），
+        逐次比较K线时只做数值比较，不生成 Timestamp 对象
+        """
+        if isinstance(df, np.ndarray):
+            return df[:, KLINE_TIME], df[:, KLINE_CLOSE], df[:, KLINE_HIGH], df[:, KLINE_LOW]
+        index = df.index
+        times = index.asi8 if isinstance(index, pd.DatetimeIndex) else index.to_numpy()
+        return times, df['close'].to_numpy(), df['high'].to_numpy(), df['low'].to_numpy()
+    
+    @staticmethod
+    def _push_extremes(max_dq: deque, min_dq: deque, bar: int, high: float, low: float, window: int):
+        """单调队列加入一根K线，并移出窗口外的元素（队列元素为 (K线序号, 价格)）"""
+        while max_dq and max_dq[-1][1] <= high:
+            max_dq.pop()
+        max_dq.append((bar, high))
+        if max_dq[0][0] <= bar - window:
+            max_dq.popleft()
+        
+        while min_dq and min_dq[-1][1] >= low:
+            min_dq.pop()
+        min_dq.append((bar, low))
+        if min_dq[0][0] <= bar - window:
+            min_dq.popleft()
+    
+    def _incremental_rope_line(self, state: ContractState, times, high: np.ndarray, low: np.ndarray) -> float:
+        """
+        增量计算系绳线（与 calculate_rope_line 结果相同）
+        
+        用单调队列维护最近rope_period-1根已完成K线的最高价最大值和最低价最小值，
+        每根新K线摊销O(1)；当前K线的最高/最低价在计算时临时计入
         
-        # 计算系绳线
-        rope_line = (highest + lowest) / 2
+        Args:
+            state: 合约状态
+            times: K线开盘时间序列
+            high: 最高价数组
+            low: 最低价数组
         
-        result = rope_line.iloc[-1]
-        logger.debug(f"系绳线={result:.2f}")
+        Returns:
+            系绳线价格
+        """
+        n = len(high)
+        if n < self.rope_period:
+            return self.calculate_rope_line_np(high, low)
+        
+        window = self.rope_period - 1
+        
+        last_closed = times[-2]
+        if state.rope_last_bar != last_closed:
+            max_dq = state.rope_max_dq
+            if max_dq is not None and state.rope_last_bar == times[-3]:
+                # 恰好新收盘一根K线
+                bar = state.rope_bar_count
+                self._push_extremes(max_dq, state.rope_min_dq, bar, float(high[-2]), float(low[-2]), window)
+                state.rope_bar_count = bar + 1
+            else:
+                # 首次计算或数据不连续时，用最近window根已完成K线重建
+                max_dq = deque()
+                min_dq = deque()
+                for bar, i in enumerate(range(n - 1 - window, n - 1)):
+                    self._push_extremes(max_dq, min_dq, bar, float(high[i]), float(low[i]), window)
+                state.rope_max_dq = max_dq
+                state.rope_min_dq = min_dq
+                state.rope_bar_count = window
+            state.rope_last_bar = last_closed
+        
+        max_dq = state.rope_max_dq
+        min_dq = state.rope_min_dq
+        highest = float(high[-1])
+        lowest = float(low[-1])
+        if max_dq:
+            highest = max(highest, max_dq[0][1])
+            lowest = min(lowest, min_dq[0][1])
+        
+        result = (highest + lowest) / 2
+        logger.debug("系绳线=%.2f", result)
         return result
     
     def generate_signal(
         self, 
         contract_id: str,
-        df: pd.DataFrame,
+        df: Union[pd.DataFrame, np.ndarray],
         current_position: Position,
         current_price: float
     ) -> SignalType:
@@ -125,31 +455,93 @@ class Strategy:
         
         Args:
             contract_id: 合约ID
-            df: K线数据
+            df: K线数据(DataFrame或 WebsocketKlineFeed.window() 返回的K线数组)
             current_position: 当前持仓状态
             current_price: 当前价格
         
         Returns:
             交易信号
         """
-        # 计算指标
-        mbo, mbi = self.calculate_mbo_mbi(df)
-        rope_line = self.calculate_rope_line(df)
-        
         # 记录状态
-        if contract_id not in self.contract_states:
-            self.contract_states[contract_id] = {}
+        state = self._get_or_create_state(contract_id)
+        if not self._is_ready(contract_id, state, df):
+            return SignalType.NONE
+        indicators = self._compute_indicators_only(state, df)
+        return self._decide_signal(contract_id, state, indicators, current_position, current_price)
+    
+    def _is_ready(self, contract_id: str, state: ContractState, df: Union[pd.DataFrame, np.ndarray]) -> bool:
+        """K线数量是否已满足预热要求（预热期内MBI恒为0或NaN，不会产生信号）"""
+        if state.ready:
+            return True
+        if len(df) < self.warmup_bars:
+            logger.debug("%s: 预热中，K线%s/%s根", contract_id, len(df), self.warmup_bars)
+            return False
+        state.ready = True
+        return True
+    
+    def _compute_indicators_only(
+        self,
+        state: ContractState,
+        df: Union[pd.DataFrame, np.ndarray]
+    ) -> Tuple[object, float, float, float]:
+        """
+        计算单个合约的指标（均线、系绳线按K线增量更新）
+        
+        只读写该合约自己的 state
         
-        state = self.contract_states[contract_id]
-        state['mbo'] = mbo
-        state['mbi'] = mbi
-        state['rope_line'] = rope_line
-        state['current_price'] = current_price
+        Args:
+            state: 合约状态
+            df: K线数据(DataFrame或K线数组)
+        
+        Returns:
+            (当前K线时间, mbo, mbi, 系绳线)
+        """
+        # 当前K线及其收盘/最高/最低价都未变化时直接复用上次结果
+        times, closes, high, low = self._kline_columns(df)
+        cache_key = (times[-1], closes[-1], high[-1], low[-1])
+        cache = state.indicator_cache
+        if cache is not None and cache[0] == cache_key:
+            _, mbo, mbi, rope_line = cache
+        else:
+            mbo, mbi = self._incremental_mbo_mbi(state, times, closes)
+            if mbi > 0 or mbi < 0:
+                rope_line = self._incremental_rope_line(state, times, high, low)
+            else:
+                # MBI为0或NaN时信号逻辑不使用系绳线，跳过计算（单调队列在下次需要时自动重建）
+                rope_line = float('nan')
+            state.indicator_cache = (cache_key, mbo, mbi, rope_line)
+        return times[-1], mbo, mbi, rope_line
+    
+    def _decide_signal(
+        self,
+        contract_id: str,
+        state: ContractState,
+        indicators: Tuple[object, float, float, float],
+        current_position: Position,
+        current_price: float
+    ) -> SignalType:
+        """
+        根据已算好的指标执行信号状态机，并更新合约状态
+        
+        Args:
+            contract_id: 合约ID
+            state: 合约状态
+            indicators: _compute_indicators_only 的返回值
+            current_position: 当前持仓状态
+            current_price: 当前价格
+        
+        Returns:
+            交易信号
+        """
+        current_bar_id, mbo, mbi, rope_line = indicators
+        state.mbo = mbo
+        state.mbi = mbi
+        state.rope_line = rope_line
+        state.current_price = current_price
         
         # 检查是否在同一周期内已经发出信号
-        current_timestamp = df.index[-1]
-        if 'last_signal_time' in state and state['last_signal_time'] == current_timestamp:
-            logger.debug(f"{contract_id}: 当前周期已有信号，跳过")
+        if state.last_signal_bar_id == current_bar_id:
+            logger.debug("%s: 当前周期已有信号，跳过", contract_id)
             return SignalType.NONE
         
         signal = SignalType.NONE
@@ -157,63 +549,112 @@ class Strategy:
         # 策略逻辑
         if mbi > 0:
             # MBI为正，多头趋势
-            logger.debug(f"{contract_id}: MBI>0, 多头趋势")
+            logger.debug("%s: MBI>0, 多头趋势", contract_id)
             
             if current_price > rope_line:
                 # 价格突破系绳线
-                logger.info(f"{contract_id}: 价格突破系绳线 {current_price:.2f} > {rope_line:.2f}")
+                logger.info("%s: 价格突破系绳线 %.2f > %.2f", contract_id, current_price, rope_line)
                 
                 if current_position == Position.EMPTY:
                     signal = SignalType.LONG
-                    logger.info(f"{contract_id}: 空仓 -> 开多")
+                    logger.info("%s: 空仓 -> 开多", contract_id)
                 
                 elif current_position == Position.SHORT:
                     signal = SignalType.LONG  # 会先平空再开多
-                    logger.info(f"{contract_id}: 持空 -> 平空开多")
+                    logger.info("%s: 持空 -> 平空开多", contract_id)
                 
                 elif current_position == Position.LONG:
-                    logger.debug(f"{contract_id}: 已持多，不做动作")
+                    logger.debug("%s: 已持多，不做动作", contract_id)
                     signal = SignalType.NONE
             
             elif current_price < rope_line and current_position == Position.LONG:
                 # 跌破系绳线，止盈
-                logger.info(f"{contract_id}: 跌破系绳线 {current_price:.2f} < {rope_line:.2f}, 止盈")
+                logger.info("%s: 跌破系绳线 %.2f < %.2f, 止盈", contract_id, current_price, rope_line)
                 signal = SignalType.CLOSE_LONG
         
         elif mbi < 0:
             # MBI为负，空头趋势
-            logger.debug(f"{contract_id}: MBI<0, 空头趋势")
+            logger.debug("%s: MBI<0, 空头趋势", contract_id)
             
             if current_price < rope_line:
                 # 价格跌破系绳线
-                logger.info(f"{contract_id}: 价格跌破系绳线 {current_price:.2f} < {rope_line:.2f}")
+                logger.info("%s: 价格跌破系绳线 %.2f < %.2f", contract_id, current_price, rope_line)
                 
                 if current_position == Position.EMPTY:
                     signal = SignalType.SHORT
-                    logger.info(f"{contract_id}: 空仓 -> 开空")
+                    logger.info("%s: 空仓 -> 开空", contract_id)
                 
                 elif current_position == Position.LONG:
                     signal = SignalType.SHORT  # 会先平多再开空
-                    logger.info(f"{contract_id}: 持多 -> 平多开空")
+                    logger.info("%s: 持多 -> 平多开空", contract_id)
                 
                 elif current_position == Position.SHORT:
-                    logger.debug(f"{contract_id}: 已持空，不做动作")
+                    logger.debug("%s: 已持空，不做动作", contract_id)
                     signal = SignalType.NONE
             
             elif current_price > rope_line and current_position == Position.SHORT:
                 # 突破系绳线，止盈
-                logger.info(f"{contract_id}: 突破系绳线 {current_price:.2f} > {rope_line:.2f}, 止盈")
+                logger.info("%s: 突破系绳线 %.2f > %.2f, 止盈", contract_id, current_price, rope_line)
                 signal = SignalType.CLOSE_SHORT
         
         else:
-            logger.debug(f"{contract_id}: MBI=0, 无明确趋势")
+            logger.debug("%s: MBI=0, 无明确趋势", contract_id)
         
         # 记录信号时间
         if signal != SignalType.NONE:
-            state['last_signal_time'] = current_timestamp
+            state.last_signal_bar_id = current_bar_id
         
         return signal
     
+    def generate_signals_batch(
+        self,
+        closes: np.ndarray,
+        highs: np.ndarray,
+        lows: np.ndarray,
+        positions: np.ndarray,
+        current_prices: Optional[np.ndarray] = None
+    ) -> np.ndarray:
+        """
+        批量生成多个合约（或多组参数回放）的交易信号
+        
+        指标由并行内核一次算出，信号规则与 generate_signal 相同；
+        不读写 contract_states，同一周期只发一次信号的限制由调用方负责
+        
+        Args:
+            closes: 收盘价矩阵 [合约数, K线数]，最后一列为当前K线（float32/float64，不做拷贝转换）
+            highs: 最高价矩阵 [合约数, K线数]
+            lows: 最低价矩阵 [合约数, K线数]
+            positions: 各合约持仓编码数组(Position整数值)
+            current_prices: 各合约当前价格，默认取最后一列收盘价
+        
+        Returns:
+            信号编码数组(int8, SignalType整数值)，数据不足的合约为NONE
+        """
+        closes, highs, lows = (
+            np.ascontiguousarray(m, dtype=m.dtype if m.dtype in _KERNEL_PRICE_DTYPES else np.float64)
+            for m in (np.asarray(closes), np.asarray(highs), np.asarray(lows))
+        )
+        positions = np.asarray(positions)
+        price = closes[:, -1] if current_prices is None else np.asarray(current_prices, dtype=np.float64)
+        
+        mbi, rope = last_mbi_rope_batch(closes, highs, lows, self.ma_short, self.ma_long, self.rope_period)
+        
+        # NaN参与比较均为False，数据不足的合约自然落到NONE
+        above = price > rope
+        below = price < rope
+        is_long = positions == Position.LONG
+        is_short = positions == Position.SHORT
+        bull_signal = np.where(
+            above & ~is_long, SignalType.LONG,
+            np.where(below & is_long, SignalType.CLOSE_LONG, SignalType.NONE)
+        )
+        bear_signal = np.where(
+            below & ~is_short, SignalType.SHORT,
+            np.where(above & is_short, SignalType.CLOSE_SHORT, SignalType.NONE)
+        )
+        signals = np.where(mbi > 0, bull_signal, np.where(mbi < 0, bear_signal, SignalType.NONE))
+        return signals.astype(np.int8)
+    
     def check_stop_loss(
         self,
         contract_id: str,
@@ -235,18 +676,15 @@ class Strategy:
         Returns:
             是否触发止损
         """
-        if position == Position.LONG:
-            loss_pct = (entry_price - current_price) / entry_price
-            if loss_pct >= stop_loss_pct:
-                logger.warning(f"{contract_id}: 触发多单止损 {loss_pct*100:.2f}%")
-                return True
-        
-        elif position == Position.SHORT:
-            loss_pct = (current_price - entry_price) / entry_price
-            if loss_pct >= stop_loss_pct:
-                logger.warning(f"{contract_id}: 触发空单止损 {loss_pct*100:.2f}%")
-                return True
-        
+        # 多单为正、空单为负的方向系数，亏损比例 = 方向 * (开仓价 - 当前价) / 开仓价
+        sign = _POSITION_SIGN[position]
+        if not sign:
+            return False
+        loss_pct = sign * (entry_price - current_price) / entry_price
+        if loss_pct >= stop_loss_pct:
+            if logger.isEnabledFor(logging.WARNING):
+                logger.warning("%s: 触发%s单止损 %.2f%%", contract_id, '多' if sign > 0 else '空', loss_pct * 100)
+            return True
         return False
     
     def check_take_profit(
@@ -270,20 +708,23 @@ class Strategy:
         Returns:
             是否触发止盈
         """
-        if position == Position.LONG:
-            profit_pct = (current_price - entry_price) / entry_price
-            if profit_pct >= take_profit_pct:
-                logger.info(f"{contract_id}: 触发多单止盈 {profit_pct*100:.2f}%")
-                return True
-        
-        elif position == Position.SHORT:
-            profit_pct = (entry_price - current_price) / entry_price
-            if profit_pct >= take_profit_pct:
-                logger.info(f"{contract_id}: 触发空单止盈 {profit_pct*100:.2f}%")
-                return True
-        
+        sign = _POSITION_SIGN[position]
+        if not sign:
+            return False
+        profit_pct = sign * (current_price - entry_price) / entry_price
+        if profit_pct >= take_profit_pct:
+            if logger.isEnabledFor(logging.INFO):
+                logger.info("%s: 触发%s单止盈 %.2f%%", contract_id, '多' if sign > 0 else '空', profit_pct * 100)
+            return True
         return False
     
-    def get_state(self, contract_id: str) -> Dict:
-        """获取合约当前状态"""
-        return self.contract_states.get(contract_id, {})
\ No newline at end of file
+    def _get_or_create_state(self, contract_id: str) -> ContractState:
+        """获取合约状态，不存在时创建"""
+        state = self.contract_states.get(contract_id)
+        if state is None:
+            state = self.contract_states[contract_id] = ContractState()
+        return state
+    
+    def get_state(self, contract_id: str) -> Optional[ContractState]:
+        """获取合约当前状态（尚未计算过信号时为None）"""
+        return self.contract_states.get(contract_id)
\ No newline at end of file
@@ -0,0 +1,294 @@
+"""
+策略数值内核
+供回测批量计算使用的纯数值函数（安装numba时JIT编译）
+"""
+
+import numpy as np
+
+try:
+    from numba import njit, prange
+except ImportError:  # numba为可选依赖，缺失时以纯Python执行
+    def njit(*args, **kwargs):
+        if len(args) == 1 and callable(args[0]):
+            return args[0]
+        return lambda func: func
+
+    prange = range
+
+
+# 信号编码
+SIGNAL_NONE = 0
+SIGNAL_LONG = 1  # 开多/平空开多
+SIGNAL_SHORT = 2  # 开空/平多开空
+SIGNAL_CLOSE_LONG = 3  # 平多
+SIGNAL_CLOSE_SHORT = 4  # 平空
+
+# 持仓编码
+POSITION_EMPTY = 0
+POSITION_LONG = 1
+POSITION_SHORT = -1
+
+# K线数组列（WebsocketKlineFeed 环形缓冲区布局，时间为毫秒时间戳）
+KLINE_TIME = 0
+KLINE_OPEN = 1
+KLINE_HIGH = 2
+KLINE_LOW = 3
+KLINE_CLOSE = 4
+KLINE_VOLUME = 5
+KLINE_COLUMNS = 6
+
+
+def sl_tp_hits(entry_prices, current_prices, positions, stop_loss_pct, take_profit_pct):
+    """
+    向量化检查多个持仓的止损/止盈
+
+    Args:
+        entry_prices: 开仓价格数组
+        current_prices: 当前价格数组
+        positions: 持仓方向数组（POSITION_LONG/POSITION_SHORT/POSITION_EMPTY）
+        stop_loss_pct: 止损百分比（如0.02表示2%）
+        take_profit_pct: 止盈百分比（如0.05表示5%）
+
+    Returns:
+        (止损触发掩码, 止盈触发掩码)，空仓或价格为NaN的位置均为False
+    """
+    # 多单为正、空单为负的收益率；空仓方向为0，不参与判断
+    direction = np.sign(positions).astype(np.float64)
+    with np.errstate(invalid='ignore'):
+        pnl_pct = direction * (current_prices - entry_prices) / entry_prices
+        held = direction != 0
+        return held & (pnl_pct <= -stop_loss_pct), held & (pnl_pct >= take_profit_pct)
+
+
+@njit(cache=True, fastmath=True)
+def rope_backtest(high, low, close, period, start, stop_loss_pct, take_profit_pct):
+    """
+    系绳线策略逐K线回测
+
+    第i根K线的系绳线由其之前period根已完成K线计算（与 calculate_rope_line
+    排除当前K线一致），以收盘价作为实时价格，信号规则与 generate_signal 相同；
+    止损/止盈比例大于0时先检查止损止盈
+
+    Args:
+        high: 最高价数组
+        low: 最低价数组
+        close: 收盘价数组
+        period: 系绳线周期
+        start: 开始产生信号的K线下标（不小于period）
+        stop_loss_pct: 止损比例（0表示不启用）
+        take_profit_pct: 止盈比例（0表示不启用）
+
+    Returns:
+        (信号数组int8, 每根K线的持仓开仓价float64，空仓为NaN)
+    """
+    n = close.shape[0]
+    signals = np.zeros(n, np.int8)
+    entries = np.full(n, np.nan)
+    if start < period:
+        start = period
+
+    # 单调队列（环形缓冲区存下标）维护窗口最大值/最小值
+    max_q = np.empty(period + 1, np.int64)
+    min_q = np.empty(period + 1, np.int64)
+    max_head = 0
+    max_len = 0
+    min_head = 0
+    min_len = 0
+    cap = period + 1
+
+    position = POSITION_EMPTY
+    entry_price = np.nan
+
+    for i in range(n):
+        if i >= start:
+            # 窗口为 [i-period, i-1]
+            rope = (high[max_q[max_head]] + low[min_q[min_head]]) / 2
+            price = close[i]
+            signal = SIGNAL_NONE
+
+            # 止损止盈
+            if position == POSITION_LONG:
+                change = (price - entry_price) / entry_price
+                if (stop_loss_pct > 0 and -change >= stop_loss_pct) or \
+                        (take_profit_pct > 0 and change >= take_profit_pct):
+                    signal = SIGNAL_CLOSE_LONG
+            elif position == POSITION_SHORT:
+                change = (entry_price - price) / entry_price
+                if (stop_loss_pct > 0 and -change >= stop_loss_pct) or \
+                        (take_profit_pct > 0 and change >= take_profit_pct):
+                    signal = SIGNAL_CLOSE_SHORT
+
+            if signal != SIGNAL_NONE:
+                position = POSITION_EMPTY
+                entry_price = np.nan
+            elif price > rope and position != POSITION_LONG:
+                signal = SIGNAL_LONG
+                position = POSITION_LONG
+                entry_price = price
+            elif price < rope and position != POSITION_SHORT:
+                signal = SIGNAL_SHORT
+                position = POSITION_SHORT
+                entry_price = price
+
+            signals[i] = signal
+            entries[i] = entry_price
+
+        # 将第i根K线加入窗口，并移出第 i-period 根
+        while max_len > 0 and high[max_q[(max_head + max_len - 1) % cap]] <= high[i]:
+            max_len -= 1
+        max_q[(max_head + max_len) % cap] = i
+        max_len += 1
+        if max_q[max_head] <= i - period:
+            max_head = (max_head + 1) % cap
+            max_len -= 1
+
+        while min_len > 0 and low[min_q[(min_head + min_len - 1) % cap]] >= low[i]:
+            min_len -= 1
+        min_q[(min_head + min_len) % cap] = i
+        min_len += 1
+        if min_q[min_head] <= i - period:
+            min_head = (min_head + 1) % cap
+            min_len -= 1
+
+    return signals, entries
+
+
+@njit(cache=True)
+def _neumaier_add(total, comp, x):
+    """补偿求和（Neumaier），返回新的 (和, 补偿项)"""
+    t = total + x
+    if abs(total) >= abs(x):
+        comp += (total - t) + x
+    else:
+        comp += (x - t) + total
+    return t, comp
+
+
+@njit(cache=True)
+def mbo_rope_series(close, high, low, ma_short, ma_long, rope_period):
+    """
+    一次遍历计算整段K线的MBO、MBI和系绳线序列
+
+    均线使用补偿求和的滑动窗口和（不启用fastmath，以免重排补偿运算），
+    HHV/LLV使用单调队列；第i个值与 Strategy 对 [0, i] 的K线计算结果相同
+
+    Args:
+        close: 收盘价数组
+        high: 最高价数组
+        low: 最低价数组
+        ma_short: 短周期移动平均
+        ma_long: 长周期移动平均
+        rope_period: 系绳线周期
+
+    Returns:
+        (mbo, mbi, rope) 三个float64数组，数据不足的位置为NaN
+    """
+    n = close.shape[0]
+    mbo = np.full(n, np.nan)
+    mbi = np.full(n, np.nan)
+    rope = np.full(n, np.nan)
+
+    s_sum = 0.0
+    s_comp = 0.0
+    l_sum = 0.0
+    l_comp = 0.0
+
+    cap = rope_period + 1
+    max_q = np.empty(cap, np.int64)
+    min_q = np.empty(cap, np.int64)
+    max_head = 0
+    max_len = 0
+    min_head = 0
+    min_len = 0
+
+    for i in range(n):
+        # 滑动窗口和
+        s_sum, s_comp = _neumaier_add(s_sum, s_comp, close[i])
+        if i >= ma_short:
+            s_sum, s_comp = _neumaier_add(s_sum, s_comp, -close[i - ma_short])
+        l_sum, l_comp = _neumaier_add(l_sum, l_comp, close[i])
+        if i >= ma_long:
+            l_sum, l_comp = _neumaier_add(l_sum, l_comp, -close[i - ma_long])
+
+        if i >= ma_long - 1 and i >= ma_short - 1:
+            mbo[i] = (s_sum + s_comp) / ma_short - (l_sum + l_comp) / ma_long
+            if i >= 1 and not np.isnan(mbo[i - 1]):
+                mbi[i] = mbo[i] - mbo[i - 1]
+
+        # 单调队列维护窗口 [i-rope_period+1, i] 的最大值/最小值
+        while max_len > 0 and high[max_q[(max_head + max_len - 1) % cap]] <= high[i]:
+            max_len -= 1
+        max_q[(max_head + max_len) % cap] = i
+        max_len += 1
+        if max_q[max_head] <= i - rope_period:
+            max_head = (max_head + 1) % cap
+            max_len -= 1
+
+        while min_len > 0 and low[min_q[(min_head + min_len - 1) % cap]] >= low[i]:
+            min_len -= 1
+        min_q[(min_head + min_len) % cap] = i
+        min_len += 1
+        if min_q[min_head] <= i - rope_period:
+            min_head = (min_head + 1) % cap
+            min_len -= 1
+
+        if i >= rope_period - 1:
+            rope[i] = (high[max_q[max_head]] + low[min_q[min_head]]) / 2
+
+    return mbo, mbi, rope
+
+
+@njit(cache=True)
+def _tail_sum(row, start, stop):
+    """row[start:stop] 求和，始终以float64累加（输入可为float32）"""
+    total = 0.0
+    for j in range(start, stop):
+        total += row[j]
+    return total
+
+
+@njit(cache=True, parallel=True)
+def last_mbi_rope_batch(closes, highs, lows, ma_short, ma_long, rope_period):
+    """
+    并行计算多个合约最新一根K线的MBI和系绳线
+
+    每行为一个合约的K线序列（最后一列为当前K线），结果与 Strategy 对
+    该行K线调用 calculate_mbo_mbi_np / calculate_rope_line_np 一致；
+    价格矩阵可为float32以减半内存带宽，均线求和始终以float64累加
+
+    Args:
+        closes: 收盘价矩阵 [合约数, K线数]
+        highs: 最高价矩阵 [合约数, K线数]
+        lows: 最低价矩阵 [合约数, K线数]
+        ma_short: 短周期移动平均
+        ma_long: 长周期移动平均
+        rope_period: 系绳线周期
+
+    Returns:
+        (mbi, rope) 两个长度为合约数的float64数组，数据不足时为NaN
+    """
+    n, t = closes.shape
+    mbi = np.full(n, np.nan)
+    rope = np.full(n, np.nan)
+    longest = max(ma_short, ma_long)
+
+    for k in prange(n):
+        row = closes[k]
+        if t > longest:
+            # 当前与上一根的窗口只差首尾各一根K线
+            short_prev = _tail_sum(row, t - 1 - ma_short, t - 1)
+            long_prev = _tail_sum(row, t - 1 - ma_long, t - 1)
+            short_sum = short_prev - row[t - 1 - ma_short] + row[t - 1]
+            long_sum = long_prev - row[t - 1 - ma_long] + row[t - 1]
+            mbi[k] = (short_sum / ma_short - long_sum / ma_long) - (short_prev / ma_short - long_prev / ma_long)
+        if t >= rope_period:
+            highest = highs[k, t - rope_period]
+            lowest = lows[k, t - rope_period]
+            for j in range(t - rope_period + 1, t):
+                if highs[k, j] > highest:
+                    highest = highs[k, j]
+                if lows[k, j] < lowest:
+                    lowest = lows[k, j]
+            rope[k] = (np.float64(highest) + np.float64(lowest)) / 2
+
+    return mbi, rope
@@ -5,6 +5,7 @@
 
 import asyncio
 import os
+from functools import lru_cache
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
@@ -12,9 +13,10 @@ from edgex_sdk import Client
 from dotenv import load_dotenv
 
 from config import config
-from precision_manager import precision_manager
+from precision_manager import precision_manager, RoundDirection
 from strategy import Strategy, Position
 from data_manager import DataManager
+from order_manager import OrderManager, PositionInfo
 from rate_limiter import rate_limiter
 
 load_dotenv()
@@ -49,6 +51,32 @@ class SystemTester:
         print("=" * 80)
 
 
+@lru_cache(maxsize=4)
+def _synthetic_ohlcv(seed: int, n: int) -> pd.DataFrame:
+    """
+    生成模拟小时K线（按 (seed, n) 缓存，多个测试复用同一份数据，调用方不应修改）
+    
+    Args:
+        seed: 随机种子
+        n: K线数量
+    
+    Returns:
+        包含open/high/low/close/volume列的DataFrame
+    """
+    rng = np.random.RandomState(seed)
+    dates = pd.date_range(end=datetime.now(), periods=n, freq='1h')
+    
+    # 模拟上升趋势
+    prices = 50000 + np.cumsum(rng.randn(n) * 100)
+    return pd.DataFrame({
+        'open': prices,
+        'high': prices + rng.rand(n) * 100,
+        'low': prices - rng.rand(n) * 100,
+        'close': prices,
+        'volume': rng.rand(n) * 100
+    }, index=dates)
+
+
 async def test_config():
     """测试配置模块"""
     print("\n" + "=" * 80)
@@ -95,8 +123,8 @@ def test_precision_manager():
     
     # 测试价格对齐
     price = 67892.567
-    rounded_down = precision_manager.round_price("10000001", price, "down")
-    rounded_up = precision_manager.round_price("10000001", price, "up")
+    rounded_down = precision_manager.round_price("10000001", price, RoundDirection.DOWN)
+    rounded_up = precision_manager.round_price("10000001", price, RoundDirection.UP)
     
     # 转换为浮点数进行检查
     down_val = float(rounded_down)
@@ -138,18 +166,8 @@ def test_strategy():
     strategy = Strategy(ma_short=25, ma_long=200, rope_period=50)
     
     # 创建模拟数据
-    dates = pd.date_range(end=datetime.now(), periods=250, freq='1H')
-    np.random.seed(42)
-    
-    # 模拟上升趋势
-    prices = 50000 + np.cumsum(np.random.randn(250) * 100)
-    df = pd.DataFrame({
-        'open': prices,
-        'high': prices + np.random.rand(250) * 100,
-        'low': prices - np.random.rand(250) * 100,
-        'close': prices,
-        'volume': np.random.rand(250) * 100
-    }, index=dates)
+    df = _synthetic_ohlcv(42, 250)
+    prices = df['close'].to_numpy()
     
     # 测试MBO/MBI计算
     mbo, mbi = strategy.calculate_mbo_mbi(df)
@@ -163,7 +181,7 @@ def test_strategy():
     
     # 测试信号生成
     signal = strategy.generate_signal("10000001", df, Position.EMPTY, prices[-1])
-    tester.test("信号生成", signal is not None, f"信号: {signal.value}")
+    tester.test("信号生成", signal is not None, f"信号: {signal.name}")
     
     # 测试止损止盈
     entry_price = 50000
@@ -198,23 +216,28 @@ async def test_data_manager():
         # 创建数据管理器（禁用自动刷新用于测试）
         data_manager = DataManager(client, auto_refresh=False)
         
-        # 测试初始化K线
-        print("正在获取K线数据...")
-        df = await data_manager.initialize_klines("10000001", "15m", size=100)
+        # 初始化K线和获取当前价格互不依赖，并发请求
+        print("正在获取K线数据和当前价格...")
+        df, price = await asyncio.gather(
+            data_manager.initialize_klines("10000001", "15m", size=100),
+            data_manager.get_current_price("10000001")
+        )
         tester.test("初始化K线数据", df is not None and len(df) > 0)
         
         if df is not None:
             tester.test("K线包含必要列", all(col in df.columns for col in ['open', 'high', 'low', 'close', 'volume']))
             tester.test("K线数据完整", len(df) <= 100)
-            tester.test("K线按时间排序", df.index.is_monotonic_increasing)
+            # DataManager按时间顺序追加K线，只检查最后两根（O(1)）；调试模式下仍做完整检查
+            sorted_ok = len(df) < 2 or df.index[-1] > df.index[-2]
+            if __debug__:
+                sorted_ok = sorted_ok and df.index.is_monotonic_increasing
+            tester.test("K线按时间排序", sorted_ok)
             
             # 测试获取缓存的K线
             df2 = await data_manager.get_klines("10000001", "15m")
             tester.test("获取缓存K线", df2 is not None and len(df2) > 0)
         
         # 测试获取当前价格
-        print("正在获取当前价格...")
-        price = await data_manager.get_current_price("10000001")
         tester.test("获取当前价格", price is not None and price > 0, f"价格: {price}")
         
         # 测试缓存
@@ -267,6 +290,48 @@ async def test_rate_limiter():
     tester.print_summary()
 
 
+class _StubBatchClient:
+    """模拟支持批量下单的客户端：批次中平仓单失败、开仓单成功"""
+    
+    def __init__(self):
+        self.cancelled = []
+    
+    async def create_order_batch(self, params_list):
+        return {"code": "SUCCESS", "data": [{}, {"orderId": "open-1"}]}
+    
+    async def cancel_order(self, params):
+        self.cancelled.append(params.order_id)
+        return {"code": "SUCCESS"}
+
+
+async def test_order_manager_reverse():
+    """测试批量反手时平仓失败的处理（安装的SDK无批量接口，用桩客户端覆盖该分支）"""
+    print("\n" + "=" * 80)
+    print("测试 6: 订单管理器反手")
+    print("=" * 80)
+    
+    tester = SystemTester()
+    
+    precision_manager.set_contract_info("10000001", 0.1, 3)
+    client = _StubBatchClient()
+    order_manager = OrderManager(client)
+    order_manager.positions["10000001"] = PositionInfo(
+        contract_id="10000001", symbol="BTCUSDT", position=Position.SHORT,
+        entry_price=50000.0, size=0.01, entry_time=0.0
+    )
+    
+    order_id = await order_manager._reverse_position(
+        "10000001", "BTCUSDT", "BUY", 49000.0, 49049.0, 0.01, 0.001
+    )
+    
+    tester.test("平仓失败不返回开仓单", order_id is None, f"结果: {order_id}")
+    tester.test("撤销同批次开仓单", client.cancelled == ["open-1"], f"撤单: {client.cancelled}")
+    tester.test("保留原空仓", order_manager.positions["10000001"].position == Position.SHORT)
+    tester.test("不记录平仓交易", len(order_manager.get_trade_history()) == 0)
+    
+    tester.print_summary()
+
+
 async def main():
     """主函数"""
     print("=" * 80)
@@ -279,6 +344,7 @@ async def main():
     test_strategy()
     await test_data_manager()
     await test_rate_limiter()
+    await test_order_manager_reverse()
     
     print("\n" + "=" * 80)
     print("所有测试完成！")